@@ -0,0 +1,56 @@
+# This script generates many whole languages at once across all cores
+
+# Every language is one job that calls language.generate_language() with the job's seed.
+# Because each job draws only from generators made from its own seed, a language only depends on its seed and
+# constraints, never on which worker ran it or what that worker generated before, so the output is the same for any
+# number of workers.
+
+from concurrent.futures import ProcessPoolExecutor
+import language
+import languageConstraints
+import phonologyGen
+
+
+# A generated language in a compact, picklable form
+# consonants and vowels are bytes of IPA inventory codes and morphemes is a tuple of morphologyGen.Morpheme,
+# which already store their phonemes as bytes, so sending a language back from a worker is cheap
+class LanguageRecord:
+    __slots__ = ('seed', 'consonants', 'vowels', 'morphemes')
+
+    def __init__(self, seed, consonants, vowels, morphemes):
+        self.seed = seed
+        self.consonants = consonants
+        self.vowels = vowels
+        self.morphemes = morphemes
+
+    # the (consonants, vowels) phonology tuple the generators work with
+    @property
+    def phonology(self):
+        inventory = phonologyGen.get_ipa_inventory()
+        return inventory.decode(self.consonants), inventory.decode(self.vowels)
+
+
+# generates one language from seed, runs inside a worker process
+def generate_language_record(seed, constraints, morpheme_count):
+    generated = language.generate_language(seed, constraints, morpheme_count)
+    consonants, vowels = generated.phonology
+    inventory = phonologyGen.get_ipa_inventory()
+    return LanguageRecord(seed, inventory.encode(consonants), inventory.encode(vowels), tuple(generated.morphology))
+
+
+# loads the IPA inventory once when a worker starts instead of on its first job
+def initialize_worker():
+    phonologyGen.get_ipa_inventory()
+
+
+# returns a list with one LanguageRecord per seed, in the same order as seeds
+# workers is the number of processes to use (default: one per core); workers=1 generates in this process
+def generate_languages(seeds, constraints=None, morpheme_count=30, workers=None, chunksize=16):
+    constraints = languageConstraints.parse_constraints(constraints)
+    seeds = list(seeds)
+    if workers == 1:
+        return [generate_language_record(seed, constraints, morpheme_count) for seed in seeds]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=initialize_worker) as executor:
+        return list(executor.map(generate_language_record, seeds, [constraints] * len(seeds),
+                                 [morpheme_count] * len(seeds), chunksize=chunksize))
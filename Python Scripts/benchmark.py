@@ -0,0 +1,309 @@
+# This script benchmarks every stage of generating a language
+#
+# usage: python benchmark.py [--quick] [--only NAME ...] [--update-baseline] [--tolerance FRACTION] [--import-budget MS]
+#
+# Every case draws from a random.Random with a fixed seed, so each run does exactly the same work.
+# For every case it reports operations per second, the median (p50) and 99th percentile (p99) time of one operation
+# and the peak memory traced while running the case once more under tracemalloc.
+# Results are compared against benchmarkBaseline.json, and any case that got slower by more than the tolerance is
+# reported as a regression and makes the script exit with status 1. Run with --update-baseline to store new numbers.
+# With --stats stats.json every case is run once more with instrumentation on and the collected stage timings and
+# phoneme pick counts are written to stats.json.
+# The import_time check imports the generation path (cli, language, lexiconGen) in a fresh interpreter and fails if
+# that takes longer than IMPORT_BUDGET_MS or pulls in numpy, tabulate or matplotlib, which would make one-shot
+# generation from build scripts start slowly again.
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+import chartRenderer
+import instrumentation
+import language
+import morphologyGen
+import phonologyGen
+import wordGen
+import zipf
+
+SEED = 1234
+SCRIPT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(SCRIPT_DIRECTORY, 'benchmarkBaseline.json')
+# milliseconds importing the generation path may take, not counting the interpreter's own startup
+IMPORT_BUDGET_MS = 50
+# modules only the code paths that need them may import
+HEAVY_MODULES = ('numpy', 'tabulate', 'matplotlib')
+IMPORT_TIME_SCRIPT = '''
+import sys
+import time
+start = time.perf_counter()
+import cli
+import language
+import lexiconGen
+elapsed = time.perf_counter() - start
+print(elapsed * 1000, *[m for m in HEAVY_MODULES if m in sys.modules])
+'''
+
+
+# A benchmark case
+# make_operation(rng) sets the case up and returns a function that does one operation each call
+# every sample times batch operations, and the case is timed over samples samples
+# cases marked as slow are skipped with --quick
+class BenchmarkCase:
+    def __init__(self, name, make_operation, batch=1, samples=1000, slow=False):
+        self.name = name
+        self.make_operation = make_operation
+        self.batch = batch
+        self.samples = samples
+        self.slow = slow
+
+
+def benchmark_language():
+    return language.generate_language(SEED)
+
+
+def zipfy_random_case(rng):
+    return lambda: zipf.zipfy_random(5, rng)
+
+
+def generate_syllable_case(rng):
+    phonology = benchmark_language().phonology
+    return lambda: morphologyGen.generate_syllable(phonology, None, rng)
+
+
+def generate_morpheme_case(rng):
+    phonology = benchmark_language().phonology
+    return lambda: morphologyGen.generate_morpheme_from_meaning(phonology, None, 'freeLexical', 'nomeaning', None, rng)
+
+
+def select_consonants_case(rng):
+    return lambda: phonologyGen.select_consonants(None, rng)
+
+
+# every operation picks the consonants of 1000 languages
+def select_consonants_batch_case(rng):
+    return lambda: phonologyGen.select_consonants_batch(1000, None, rng)
+
+
+def select_vowels_case(rng):
+    return lambda: phonologyGen.select_vowels(None, rng)
+
+
+# generate_morphology() is list(generate_lexicon(...)), so every operation adds the next morpheme of that lexicon
+# to a list, which gives percentiles per morpheme while still keeping the whole morphology in memory
+def generate_morphology_case(count):
+    def make_operation(rng):
+        phonology = benchmark_language().phonology
+        morphemes = morphologyGen.generate_lexicon(phonology, itertools.repeat(('nomeaning', 'freeLexical'), count),
+                                                   rng=rng)
+        morphology = []
+        return lambda: morphology.append(next(morphemes))
+    return make_operation
+
+
+# every operation picks the vowels of 1000 languages with 7 vowels each, which the preset systems do not cover
+def select_vowels_batch_case(rng):
+    return lambda: phonologyGen.select_vowels_batch(1000, ['vowel inventory size: 7'], rng)
+
+
+def display_phonology_case(rng):
+    phonology = benchmark_language().phonology
+
+    def operation():
+        with contextlib.redirect_stdout(io.StringIO()):
+            phonologyGen.display_phonology(phonology)
+    return operation
+
+
+# every operation writes the charts of one language to memory, the way chartRenderer.py renders many languages
+def render_charts_case(rng):
+    phonology = benchmark_language().phonology
+    out = io.StringIO()
+    return lambda: chartRenderer.render_charts([('Language', phonology)], out, 'markdown')
+
+
+# every operation composes the paradigm of a new stem with 4 prefixes and 12 suffixes, 65 words
+def compose_paradigm_case(rng):
+    phonology = benchmark_language().phonology
+    glosses = [(f'prefix{i}', 'boundPrefix') for i in range(4)] + [(f'suffix{i}', 'boundAffix') for i in range(12)]
+    composer = wordGen.WordComposer(morphologyGen.generate_lexicon(phonology, glosses, rng=rng))
+    stems = morphologyGen.generate_lexicon(phonology, itertools.repeat(('stem', 'freeLexical')), rng=rng)
+    return lambda: composer.paradigm(next(stems))
+
+
+CASES = [
+    BenchmarkCase('zipfy_random', zipfy_random_case, batch=1000, samples=200),
+    BenchmarkCase('generate_syllable', generate_syllable_case, batch=100, samples=200),
+    BenchmarkCase('generate_morpheme_from_meaning', generate_morpheme_case, batch=100, samples=200),
+    BenchmarkCase('select_consonants', select_consonants_case, batch=10, samples=200),
+    BenchmarkCase('select_consonants_batch_1000', select_consonants_batch_case, samples=20),
+    BenchmarkCase('select_vowels', select_vowels_case, batch=100, samples=200),
+    BenchmarkCase('select_vowels_batch_1000', select_vowels_batch_case, samples=20),
+    BenchmarkCase('generate_morphology_30', generate_morphology_case(30), samples=30),
+    BenchmarkCase('generate_morphology_10k', generate_morphology_case(10000), samples=10000),
+    BenchmarkCase('generate_morphology_1m', generate_morphology_case(1000000), samples=1000000, slow=True),
+    BenchmarkCase('display_phonology', display_phonology_case, samples=200),
+    BenchmarkCase('render_charts_markdown', render_charts_case, batch=10, samples=200),
+    BenchmarkCase('compose_paradigm', compose_paradigm_case, batch=10, samples=200)
+]
+
+
+# returns the p-th percentile of already sorted values
+def percentile(sorted_values, p):
+    index = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run_case(case):
+    operation = case.make_operation(random.Random(SEED))
+    timings = []
+    total = 0
+    for i in range(case.samples):
+        start = time.perf_counter_ns()
+        for j in range(case.batch):
+            operation()
+        elapsed = time.perf_counter_ns() - start
+        timings.append(elapsed / case.batch)
+        total += elapsed
+    timings.sort()
+
+    # run the case again under tracemalloc, which slows it down too much to time it at the same time
+    tracemalloc.start()
+    operation = case.make_operation(random.Random(SEED))
+    for i in range(case.samples * case.batch):
+        operation()
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        'ops_per_sec': case.samples * case.batch / (total / 1e9),
+        'p50_us': percentile(timings, 50) / 1000,
+        'p99_us': percentile(timings, 99) / 1000,
+        'peak_memory_kb': peak_memory / 1024
+    }
+
+
+# returns the fastest of runs import times of the generation path in milliseconds and the heavy modules it imported
+def measure_import_time(runs=5):
+    script = f'HEAVY_MODULES = {HEAVY_MODULES!r}\n' + IMPORT_TIME_SCRIPT
+    fastest = None
+    heavy = []
+    for i in range(runs):
+        output = subprocess.run([sys.executable, '-c', script], cwd=SCRIPT_DIRECTORY, capture_output=True, text=True,
+                                check=True).stdout.split()
+        elapsed = float(output[0])
+        heavy = output[1:]
+        if fastest is None or elapsed < fastest:
+            fastest = elapsed
+    return fastest, heavy
+
+
+# returns the problems found by the import time check, printing its result
+def check_import_time(budget_ms):
+    elapsed, heavy = measure_import_time()
+    print(f'import_time: {elapsed:.1f} ms (budget {budget_ms:g} ms)')
+    problems = []
+    if elapsed > budget_ms:
+        problems.append(f'importing the generation path takes {elapsed:.1f} ms, more than the {budget_ms:g} ms budget')
+    if heavy:
+        problems.append(f'importing the generation path imports {", ".join(heavy)}')
+    return problems
+
+
+# returns the names of cases whose throughput dropped by more than tolerance compared to baseline
+def find_regressions(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        if name in baseline and result['ops_per_sec'] < baseline[name]['ops_per_sec'] * (1 - tolerance):
+            regressions.append(name)
+    return regressions
+
+
+def print_results(results, baseline):
+    print(f'{"case":32} {"ops/sec":>12} {"p50 us":>10} {"p99 us":>10} {"peak KB":>10} {"vs baseline":>12}')
+    for name, r in results.items():
+        if name in baseline:
+            change = f'{r["ops_per_sec"] / baseline[name]["ops_per_sec"] - 1:+.1%}'
+        else:
+            change = 'new'
+        print(f'{name:32} {r["ops_per_sec"]:12.1f} {r["p50_us"]:10.2f} {r["p99_us"]:10.2f} '
+              f'{r["peak_memory_kb"]:10.1f} {change:>12}')
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark every stage of language generation.')
+    parser.add_argument('--quick', action='store_true', help='skip the slow cases')
+    parser.add_argument('--only', nargs='+', metavar='NAME', help='only run these cases')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline file to compare against')
+    parser.add_argument('--update-baseline', action='store_true', help='store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='fraction of throughput a case may lose before it counts as a regression')
+    parser.add_argument('--stats', metavar='PATH', help='write instrumentation stats of the cases to this file')
+    parser.add_argument('--import-budget', type=float, default=IMPORT_BUDGET_MS, metavar='MS',
+                        help='milliseconds importing the generation path may take')
+    args = parser.parse_args(argv)
+    if args.only:
+        # import_time is not in CASES, it is checked on its own after them
+        names = [c.name for c in CASES] + ['import_time']
+        unknown = [name for name in args.only if name not in names]
+        if unknown:
+            parser.error(f'unknown case {", ".join(unknown)}, expected one of {", ".join(names)}')
+
+    baseline = load_baseline(args.baseline)
+    cases = []
+    for case in CASES:
+        if args.only and case.name not in args.only:
+            continue
+        if args.quick and case.slow:
+            continue
+        cases.append(case)
+
+    results = {}
+    for case in cases:
+        print(f'running {case.name}...', file=sys.stderr)
+        results[case.name] = run_case(case)
+
+    print_results(results, baseline)
+    import_problems = []
+    if not args.only or 'import_time' in args.only:
+        import_problems = check_import_time(args.import_budget)
+
+    if args.stats:
+        with instrumentation.collect() as stats:
+            for case in cases:
+                operation = case.make_operation(random.Random(SEED))
+                for i in range(case.samples * case.batch):
+                    operation()
+        stats.dump(args.stats)
+        print(f'instrumentation stats written to {args.stats}')
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2)
+        print(f'baseline written to {args.baseline}')
+        return 0
+
+    regressions = find_regressions(results, baseline, args.tolerance)
+    for name in regressions:
+        print(f'regression: {name} is more than {args.tolerance:.0%} slower than the baseline')
+    for problem in import_problems:
+        print(f'regression: {problem}')
+    return 1 if regressions or import_problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,195 @@
+# This script writes the phoneme charts of many languages to a single text, HTML or Markdown file
+#
+# usage: python chartRenderer.py [--format text|html|markdown] [-o charts.md] [--start-seed N] [--count N]
+#                                [-c constraints.txt] [--constraint TEXT ...]
+#
+# Every language is made from its seed with language.generate_language() and its charts are written as soon as the
+# language is made, so only one language is ever in memory, however many are rendered.
+# The charts are the ones phonologyGen.display_phonology() prints: the pulmonic and non-pulmonic consonant charts,
+# which only have the rows and columns the language uses, followed by the vowels.
+# Every consonant's place in the charts comes from phonologyGen.get_consonant_chart_positions(), which is worked out
+# once, so rendering a language only visits its own consonants.
+
+import argparse
+import html
+import sys
+import unicodedata
+import language
+import languageConstraints
+import lexiconGen
+import phonologyGen
+
+CHART_TITLES = ('Pulmonic consonants', 'Non-pulmonic consonants')
+
+
+# returns how many columns text takes up in a monospaced font, combining marks like the tie bar in k͡p take none
+def display_width(text):
+    return sum(1 for c in text if not unicodedata.combining(c))
+
+
+def pad(text, width):
+    return text + ' ' * (width - display_width(text))
+
+
+# Writes charts as plain text tables with aligned columns
+class TextChartWriter:
+    def __init__(self, out):
+        self.out = out
+
+    def begin(self):
+        pass
+
+    def end(self):
+        pass
+
+    def heading(self, text):
+        self.out.write(f'{text}\n{"=" * display_width(text)}\n\n')
+
+    def subheading(self, text):
+        self.out.write(f'{text}\n\n')
+
+    def paragraph(self, text):
+        self.out.write(f'{text}\n\n')
+
+    def table(self, header, rows):
+        # a chart has at most a dozen rows, so they are kept to work out the column widths
+        rows = list(rows)
+        widths = [display_width(h) for h in header]
+        for row in rows:
+            for i, cell in enumerate(row):
+                widths[i] = max(widths[i], display_width(cell))
+        write = self.out.write
+        write(' | '.join(pad(h, w) for h, w in zip(header, widths)).rstrip() + '\n')
+        write('-+-'.join('-' * w for w in widths) + '\n')
+        for row in rows:
+            write(' | '.join(pad(cell, w) for cell, w in zip(row, widths)).rstrip() + '\n')
+        write('\n')
+
+
+# Writes charts as Markdown tables
+class MarkdownChartWriter:
+    def __init__(self, out):
+        self.out = out
+
+    def begin(self):
+        pass
+
+    def end(self):
+        pass
+
+    def heading(self, text):
+        self.out.write(f'## {text}\n\n')
+
+    def subheading(self, text):
+        self.out.write(f'### {text}\n\n')
+
+    def paragraph(self, text):
+        self.out.write(f'{text}\n\n')
+
+    def table(self, header, rows):
+        write = self.out.write
+        write('| ' + ' | '.join(markdown_cell(h) for h in header) + ' |\n')
+        write('|' + '---|' * len(header) + '\n')
+        for row in rows:
+            write('| ' + ' | '.join(markdown_cell(cell) for cell in row) + ' |\n')
+        write('\n')
+
+
+def markdown_cell(text):
+    return text.strip().replace('|', '\\|')
+
+
+# Writes charts as an HTML document
+class HtmlChartWriter:
+    def __init__(self, out):
+        self.out = out
+
+    def begin(self):
+        self.out.write('<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n<title>Phoneme charts</title>\n'
+                       '</head>\n<body>\n')
+
+    def end(self):
+        self.out.write('</body>\n</html>\n')
+
+    def heading(self, text):
+        self.out.write(f'<h2>{html.escape(text)}</h2>\n')
+
+    def subheading(self, text):
+        self.out.write(f'<h3>{html.escape(text)}</h3>\n')
+
+    def paragraph(self, text):
+        self.out.write(f'<p>{html.escape(text)}</p>\n')
+
+    def table(self, header, rows):
+        write = self.out.write
+        write('<table>\n<tr>' + ''.join(f'<th>{html.escape(h)}</th>' for h in header) + '</tr>\n')
+        for row in rows:
+            write('<tr>' + ''.join(f'<td>{html.escape(cell.strip())}</td>' for cell in row) + '</tr>\n')
+        write('</table>\n')
+
+
+FORMATS = {
+    'text': TextChartWriter,
+    'markdown': MarkdownChartWriter,
+    'html': HtmlChartWriter
+}
+
+
+# writes the charts of one phonology with writer
+def write_phonology(writer, title, phonology):
+    consonants, vowels = phonology
+    writer.heading(title)
+    for chart_title, chart in zip(CHART_TITLES, phonologyGen.consonant_charts(consonants)):
+        if len(chart) > 0:
+            writer.subheading(chart_title)
+            writer.table(chart.header(), chart.rows())
+    writer.paragraph(f'Vowels: {" ".join(v.ipaChar for v in vowels)}')
+
+
+# writes the charts of every (title, phonology) pair in phonologies to out in chart_format and returns how many
+# phonologies were written
+# phonologies can be a generator, every phonology is written before the next one is asked for
+def render_charts(phonologies, out, chart_format='markdown'):
+    if chart_format not in FORMATS:
+        raise ValueError(f"unknown chart format '{chart_format}', expected one of {', '.join(FORMATS)}")
+    writer = FORMATS[chart_format](out)
+    writer.begin()
+    count = 0
+    for title, phonology in phonologies:
+        write_phonology(writer, title, phonology)
+        count += 1
+    writer.end()
+    return count
+
+
+# yields (title, phonology) for the languages made from seeds
+def language_phonologies(seeds, constraints=None):
+    constraints = languageConstraints.parse_constraints(constraints)
+    for seed in seeds:
+        yield f'Language {seed}', language.generate_language(seed, constraints, morpheme_count=0).phonology
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write the phoneme charts of many languages to one file.')
+    parser.add_argument('--format', choices=sorted(FORMATS), default='markdown', help='format of the charts')
+    parser.add_argument('-o', '--output', help='file to write the charts to (default: standard output)')
+    parser.add_argument('--start-seed', type=int, default=0, help='seed of the first language')
+    parser.add_argument('--count', type=int, default=1, help='how many languages to render')
+    parser.add_argument('-c', '--constraints', help='file with one constraint per line')
+    parser.add_argument('--constraint', action='append', default=[], metavar='TEXT',
+                        help='a constraint, can be given more than once')
+    args = parser.parse_args(argv)
+
+    constraint_strings = lexiconGen.read_constraints(args.constraints) if args.constraints else []
+    constraints = languageConstraints.parse_constraints(constraint_strings + args.constraint)
+    phonologies = language_phonologies(range(args.start_seed, args.start_seed + args.count), constraints)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as out:
+            count = render_charts(phonologies, out, args.format)
+    else:
+        count = render_charts(phonologies, sys.stdout, args.format)
+    print(f'rendered {count} languages', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+# The command line entry point for the generators
+#
+# usage: python cli.py generate [--seed N] [-c constraints.txt] [--constraint TEXT ...] [--morphemes N]
+#                               [--words MEANING ...] [--json]
+#        python cli.py display [--seed N] [-c constraints.txt] [--constraint TEXT ...] [--morphemes N]
+#        python cli.py lexicon glosses.tsv [options of lexiconGen.py]
+#        python cli.py bench [options of benchmark.py]
+#        python cli.py validate [options of validation.py]
+#
+# generate prints a language as plain text or JSON and is meant for build scripts, so it starts fast: numpy,
+# tabulate and matplotlib are only imported by the code paths that need them (the batch generators, the phonology
+# tables and the zipfy histogram), never by this module or the generators it imports.
+# benchmark.py checks that importing the generation path stays within benchmark.IMPORT_BUDGET_MS.
+# display prints the phonology tables of main.py, lexicon, bench and validate run lexiconGen.py, benchmark.py and
+# validation.py.
+# Without --seed a random seed is picked and printed, so the language can be made again.
+
+import argparse
+import json
+import random
+import sys
+import language
+import languageConstraints
+import lexiconGen
+
+
+def add_language_arguments(parser):
+    parser.add_argument('--seed', type=int, help='seed of the language (default: random)')
+    parser.add_argument('-c', '--constraints', help='file with one constraint per line')
+    parser.add_argument('--constraint', action='append', default=[], metavar='TEXT',
+                        help="a constraint, e.g. 'vowel inventory size: 5', can be given more than once")
+    parser.add_argument('--morphemes', type=int, default=30, help='how many morphemes to generate')
+
+
+# returns the language the arguments of add_language_arguments() describe
+def language_from_arguments(args):
+    if args.seed is None:
+        args.seed = random.randrange(2 ** 32)
+    constraint_strings = lexiconGen.read_constraints(args.constraints) if args.constraints else []
+    constraints = languageConstraints.parse_constraints(constraint_strings + args.constraint)
+    return language.generate_language(args.seed, constraints, args.morphemes)
+
+
+def morpheme_dict(m):
+    return {'meaning': m.meaning, 'type': m.morphemeType, 'pronunciation': m.pronunciation}
+
+
+def generate_command(args):
+    generated = language_from_arguments(args)
+    consonants, vowels = generated.phonology
+    words = [generated.word_for(meaning) for meaning in args.words]
+    if args.json:
+        print(json.dumps({
+            'seed': generated.seed,
+            'consonants': [c.ipaChar for c in consonants],
+            'vowels': [v.ipaChar for v in vowels],
+            'morphemes': [morpheme_dict(m) for m in generated.morphology],
+            'words': [morpheme_dict(m) for m in words]
+        }, ensure_ascii=False, indent=2))
+        return 0
+
+    print(f'seed: {generated.seed}')
+    print(f'consonants: {" ".join(c.ipaChar for c in consonants)}')
+    print(f'vowels: {" ".join(v.ipaChar for v in vowels)}')
+    for m in generated.morphology + words:
+        print(f'{m.meaning}\t{m.morphemeType}\t{m.pronunciation}')
+    return 0
+
+
+def display_command(args):
+    generated = language_from_arguments(args)
+    print(f'seed: {generated.seed}')
+    generated.display()
+    return 0
+
+
+def lexicon_command(args):
+    lexiconGen.main(args.arguments)
+    return 0
+
+
+def bench_command(args):
+    import benchmark
+    return benchmark.main(args.arguments)
+
+
+def validate_command(args):
+    import validation
+    return validation.main(args.arguments)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate languages.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    generate_parser = subparsers.add_parser('generate', help='print a language as text or JSON')
+    add_language_arguments(generate_parser)
+    generate_parser.add_argument('--words', nargs='+', default=[], metavar='MEANING',
+                                 help='also print the words for these meanings')
+    generate_parser.add_argument('--json', action='store_true', help='print the language as JSON')
+    generate_parser.set_defaults(run=generate_command)
+
+    display_parser = subparsers.add_parser('display', help='print the phonology tables and morphemes of a language')
+    add_language_arguments(display_parser)
+    display_parser.set_defaults(run=display_command)
+
+    # lexicon, bench and validate hand all their arguments, --help included, to the script they run
+    lexicon_parser = subparsers.add_parser('lexicon', help='generate a lexicon for a list of meanings',
+                                           add_help=False)
+    lexicon_parser.set_defaults(run=lexicon_command, passes_arguments=True)
+
+    bench_parser = subparsers.add_parser('bench', help='run the benchmarks', add_help=False)
+    bench_parser.set_defaults(run=bench_command, passes_arguments=True)
+
+    validate_parser = subparsers.add_parser('validate', help='check the distributions of the samplers',
+                                            add_help=False)
+    validate_parser.set_defaults(run=validate_command, passes_arguments=True)
+
+    args, arguments = parser.parse_known_args(argv)
+    if getattr(args, 'passes_arguments', False):
+        args.arguments = arguments
+    elif arguments:
+        parser.error(f'unrecognized arguments: {" ".join(arguments)}')
+    return args.run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
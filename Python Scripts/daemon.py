@@ -0,0 +1,421 @@
+# This script keeps languages in memory and serves words and names over a local socket
+#
+# usage: python daemon.py [--host 127.0.0.1] [--port 7341] [--unix PATH] [--max-languages N] [--batch-window MS]
+#                         [--preload SEED ...]
+#
+# Starting Python, importing numpy and reading the IPA inventory takes far longer than making a word, so instead of
+# running a script per request a game server keeps this daemon running and asks it for words.
+# The inventory is loaded once at startup and generated languages stay resident, most recently used first.
+#
+# The protocol is JSON lines: every request is one JSON object on its own line and gets one JSON object back on its
+# own line, in the order the requests finish. Every request can carry an "id", which is copied into its response.
+#   {"id": 1, "op": "word", "seed": 42, "meaning": "sword"}
+#   {"id": 1, "ok": true, "result": {"meaning": "sword", "type": "freeLexical", "pronunciation": "...", ...}}
+# Requests name their language with "seed" and optionally "constraints", a list of constraint strings.
+# ops:
+#   ping                                             -> "pong"
+#   phonology                                        -> {"consonants": [...], "vowels": [...]}
+#   word       meaning, type (default freeLexical)   -> a word, see word_result()
+#   words      meanings, type                        -> a list of words
+#   names      count, syllables (default 2)          -> a list of random names made of that many syllables
+# Requests are generated on the event loop, so words and names are capped at MAX_WORDS_PER_REQUEST,
+# MAX_NAMES_PER_REQUEST and MAX_SYLLABLES_PER_NAME to keep one request from holding up every other client.
+# A request line may be up to REQUEST_LINE_LIMIT bytes, which fits the largest words request; a longer line gets an
+# error response and is skipped.
+# A request that fails gets {"id": ..., "ok": false, "error": "..."}.
+#
+# Requests are not answered one at a time: everything that arrives within the batch window is handled together.
+# Concurrent requests for the same word are made once and share the result, and all name requests for a language
+# are generated as one syllableBatch.SyllableEngine batch.
+# Words come from language.Language.word_for(), so they are the same as anywhere else the language is used.
+# Names are random draws from a generator seeded by the language's seed.
+#
+# DaemonClient is a small blocking client for talking to a running daemon, e.g. from tests or a game server.
+
+import argparse
+import asyncio
+import json
+import socket
+import sys
+from collections import OrderedDict
+from functools import lru_cache
+import language
+import languageConstraints
+import morphologyGen
+import phonologyGen
+import seeding
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 7341
+DEFAULT_MAX_LANGUAGES = 64
+# seconds the daemon waits for more requests before handling a batch
+# with 0 a batch is handled on the next pass of the event loop, which still takes in every request that had already
+# arrived, without adding any latency
+DEFAULT_BATCH_WINDOW = 0
+MAX_WORDS_PER_REQUEST = 10000
+MAX_NAMES_PER_REQUEST = 10000
+MAX_SYLLABLES_PER_NAME = 8
+MAX_MEANING_LENGTH = 64
+# a meaning takes at most 6 bytes of JSON per character (\uXXXX) plus its quotes, comma and a space, and the rest of
+# the request gets 64 KiB, asyncio's default line limit
+REQUEST_LINE_LIMIT = MAX_WORDS_PER_REQUEST * (MAX_MEANING_LENGTH * 6 + 4) + (1 << 16)
+
+
+# A language kept in memory by the daemon
+class ResidentLanguage:
+    def __init__(self, generated):
+        self.language = generated
+        self.engine = None
+        self.names_rng = None
+
+    # returns the SyllableEngine for names, made the first time names are asked for
+    def syllable_engine(self):
+        if self.engine is None:
+            import syllableBatch
+            self.engine = syllableBatch.SyllableEngine(self.language.phonology, self.language.constraints)
+            self.names_rng = seeding.numpy_rng(seeding.stage_rng(self.language.seed, 'names'))
+        return self.engine
+
+
+# The languages the daemon keeps in memory, at most max_languages of them, dropping the least recently used
+class LanguageCache:
+    def __init__(self, max_languages=DEFAULT_MAX_LANGUAGES):
+        self.max_languages = max_languages
+        self.languages = OrderedDict()
+
+    def __len__(self):
+        return len(self.languages)
+
+    # returns the ResidentLanguage for seed and constraints, generating it if it is not in memory
+    def get(self, seed, constraints):
+        key = (seed, constraints)
+        resident = self.languages.get(key)
+        if resident is not None:
+            self.languages.move_to_end(key)
+            return resident
+        resident = ResidentLanguage(language.generate_language(seed, constraints, morpheme_count=0))
+        self.languages[key] = resident
+        if len(self.languages) > self.max_languages:
+            self.languages.popitem(last=False)
+        return resident
+
+
+# returns the parsed constraints of a request, which are usually the same few lists over and over
+@lru_cache(maxsize=256)
+def parse_request_constraints(constraint_strings):
+    return languageConstraints.parse_constraints(list(constraint_strings))
+
+
+def word_result(morpheme):
+    return {
+        'meaning': morpheme.meaning,
+        'type': morpheme.morphemeType,
+        'pronunciation': morpheme.pronunciation,
+        'syllables': [str(s) for s in morpheme.syllables]
+    }
+
+
+# Collects the word and name requests that arrive within one batch window and handles them together
+class RequestBatcher:
+    def __init__(self, window=DEFAULT_BATCH_WINDOW):
+        self.window = window
+        # (resident, meaning, morpheme type) -> future every request for that word waits on
+        self.words = {}
+        # resident -> list of (count, syllables, future)
+        self.names = {}
+        self.flush_handle = None
+
+    def schedule_flush(self):
+        if self.flush_handle is None:
+            loop = asyncio.get_running_loop()
+            if self.window > 0:
+                self.flush_handle = loop.call_later(self.window, self.flush)
+            else:
+                self.flush_handle = loop.call_soon(self.flush)
+
+    # returns a future for the word, shared with every other request for the same word in this batch
+    def word(self, resident, meaning, morpheme_type):
+        key = (resident, meaning, morpheme_type)
+        future = self.words.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self.words[key] = future
+            self.schedule_flush()
+        return future
+
+    def names_for(self, resident, count, syllables):
+        future = asyncio.get_running_loop().create_future()
+        self.names.setdefault(resident, []).append((count, syllables, future))
+        self.schedule_flush()
+        return future
+
+    def flush(self):
+        self.flush_handle = None
+        words, self.words = self.words, {}
+        names, self.names = self.names, {}
+
+        # flush runs as an event loop callback, so any error has to go to the futures or their requests never finish
+        # a future whose request was cancelled is already done and is skipped
+        # words are not vectorized like names: every word comes from its own generator seeded by its meaning and is
+        # checked against the homophones before it, so they are made one at a time, only shared between requests
+        for (resident, meaning, morpheme_type), future in words.items():
+            if future.done():
+                continue
+            try:
+                future.set_result(word_result(resident.language.word_for(meaning, morpheme_type)))
+            except Exception as e:
+                future.set_exception(e)
+
+        for resident, requests in names.items():
+            try:
+                engine = resident.syllable_engine()
+                total = sum(count * syllables for count, syllables, future in requests)
+                pronunciations = engine.generate(total, resident.names_rng).pronunciations()
+            except Exception as e:
+                for count, syllables, future in requests:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            position = 0
+            for count, syllables, future in requests:
+                result = []
+                for i in range(count):
+                    result.append(''.join(pronunciations[position:position + syllables]))
+                    position += syllables
+                if not future.done():
+                    future.set_result(result)
+
+
+class GenerationDaemon:
+    def __init__(self, max_languages=DEFAULT_MAX_LANGUAGES, batch_window=DEFAULT_BATCH_WINDOW):
+        self.languages = LanguageCache(max_languages)
+        self.batcher = RequestBatcher(batch_window)
+
+    # loads everything a first request would otherwise wait for
+    def warm_up(self, seeds=()):
+        phonologyGen.get_ipa_inventory()
+        phonologyGen.get_vowel_distances()
+        for seed in seeds:
+            self.languages.get(seed, languageConstraints.parse_constraints())
+
+    # returns the response object for one request line
+    async def handle_line(self, line):
+        request_id = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('a request must be a JSON object')
+            request_id = request.get('id')
+            result = await self.handle_request(request)
+        except (ValueError, RuntimeError, TypeError) as e:
+            return {'id': request_id, 'ok': False, 'error': str(e)}
+        except Exception as e:
+            return {'id': request_id, 'ok': False, 'error': f'internal error: {e!r}'}
+        return {'id': request_id, 'ok': True, 'result': result}
+
+    async def handle_request(self, request):
+        op = request.get('op')
+        if op == 'ping':
+            return 'pong'
+
+        resident = self.resident_language(request)
+        if op == 'phonology':
+            consonants, vowels = resident.language.phonology
+            return {'consonants': [c.ipaChar for c in consonants], 'vowels': [v.ipaChar for v in vowels]}
+        if op == 'word':
+            meaning = request_meaning(request_field(request, 'meaning'))
+            return await self.batcher.word(resident, meaning, morpheme_type(request))
+        if op == 'words':
+            meanings = request_field(request, 'meanings')
+            if not isinstance(meanings, list):
+                raise ValueError('meanings must be a list')
+            if len(meanings) > MAX_WORDS_PER_REQUEST:
+                raise ValueError(f'at most {MAX_WORDS_PER_REQUEST} meanings can be asked for at once')
+            meanings = [request_meaning(m) for m in meanings]
+            futures = [self.batcher.word(resident, m, morpheme_type(request)) for m in meanings]
+            return list(await asyncio.gather(*futures))
+        if op == 'names':
+            count = request_number(request, 'count', 1, MAX_NAMES_PER_REQUEST)
+            syllables = request_number(request, 'syllables', 2, MAX_SYLLABLES_PER_NAME)
+            return await self.batcher.names_for(resident, count, syllables)
+        raise ValueError(f"unknown op '{op}'")
+
+    def resident_language(self, request):
+        seed = request_field(request, 'seed')
+        if not isinstance(seed, (int, str)) or isinstance(seed, bool):
+            raise ValueError('seed must be a number or a string')
+        constraints = parse_request_constraints(tuple(request.get('constraints') or ()))
+        return self.languages.get(seed, constraints)
+
+    async def handle_connection(self, reader, writer):
+        tasks = set()
+        try:
+            while True:
+                try:
+                    line = await reader.readuntil(b'\n')
+                except asyncio.IncompleteReadError as e:
+                    # the connection closed, possibly after a last line without a newline
+                    line = e.partial
+                    if not line:
+                        break
+                except asyncio.LimitOverrunError:
+                    await skip_line(reader)
+                    await self.write_response(writer, {'id': None, 'ok': False,
+                                                       'error': f'request is longer than {REQUEST_LINE_LIMIT} bytes'})
+                    continue
+                if line.strip() == b'':
+                    continue
+                # every request runs as its own task so requests on one connection are batched together too
+                task = asyncio.ensure_future(self.respond(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, line, writer):
+        await self.write_response(writer, await self.handle_line(line))
+
+    async def write_response(self, writer, response):
+        writer.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+        await writer.drain()
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None):
+        if unix_path is not None:
+            return await asyncio.start_unix_server(self.handle_connection, path=unix_path, limit=REQUEST_LINE_LIMIT)
+        return await asyncio.start_server(self.handle_connection, host, port, limit=REQUEST_LINE_LIMIT)
+
+
+# reads and throws away the rest of a request line that is longer than the reader's limit
+async def skip_line(reader):
+    while True:
+        try:
+            await reader.readuntil(b'\n')
+            return
+        except asyncio.LimitOverrunError as e:
+            # consumed is where the newline is, or how much is buffered if it has not arrived yet
+            await reader.readexactly(e.consumed)
+        except asyncio.IncompleteReadError:
+            return
+
+
+def morpheme_type(request):
+    value = request.get('type', 'freeLexical')
+    if value not in morphologyGen.MORPHEME_TYPES:
+        raise ValueError(f"unknown morpheme type '{value}'")
+    return value
+
+
+def request_field(request, field):
+    if field not in request:
+        raise ValueError(f"request is missing '{field}'")
+    return request[field]
+
+
+def request_meaning(value):
+    if not isinstance(value, str):
+        raise ValueError('meaning must be a string')
+    if len(value) > MAX_MEANING_LENGTH:
+        raise ValueError(f'a meaning can be at most {MAX_MEANING_LENGTH} characters long')
+    return value
+
+
+def request_number(request, field, default, maximum):
+    value = request.get(field, default)
+    if not isinstance(value, int) or isinstance(value, bool) or value < 1 or value > maximum:
+        raise ValueError(f'{field} must be a whole number from 1 to {maximum}')
+    return value
+
+
+# A blocking client for a running daemon, one request at a time
+# usage:
+#     with DaemonClient() as client:
+#         print(client.word(42, 'sword')['pronunciation'])
+class DaemonClient:
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None, timeout=10):
+        if unix_path is not None:
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.settimeout(timeout)
+            self.socket.connect(unix_path)
+        else:
+            self.socket = socket.create_connection((host, port), timeout)
+        self.file = self.socket.makefile('rwb')
+        self.next_id = 0
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # sends one request and returns its result, raises RuntimeError with the daemon's message if it failed
+    def request(self, op, **fields):
+        self.next_id += 1
+        fields['op'] = op
+        fields['id'] = self.next_id
+        self.file.write(json.dumps(fields, ensure_ascii=False).encode('utf-8') + b'\n')
+        self.file.flush()
+        line = self.file.readline()
+        if not line:
+            raise RuntimeError('the daemon closed the connection')
+        response = json.loads(line)
+        if not response['ok']:
+            raise RuntimeError(response['error'])
+        return response['result']
+
+    def ping(self):
+        return self.request('ping')
+
+    def phonology(self, seed, constraints=None):
+        return self.request('phonology', seed=seed, constraints=constraints or [])
+
+    def word(self, seed, meaning, morpheme_type='freeLexical', constraints=None):
+        return self.request('word', seed=seed, meaning=meaning, type=morpheme_type, constraints=constraints or [])
+
+    def words(self, seed, meanings, morpheme_type='freeLexical', constraints=None):
+        return self.request('words', seed=seed, meanings=list(meanings), type=morpheme_type,
+                            constraints=constraints or [])
+
+    def names(self, seed, count, syllables=2, constraints=None):
+        return self.request('names', seed=seed, count=count, syllables=syllables, constraints=constraints or [])
+
+
+async def serve(args):
+    daemon = GenerationDaemon(args.max_languages, args.batch_window / 1000)
+    daemon.warm_up(args.preload)
+    server = await daemon.start(args.host, args.port, args.unix)
+    if args.unix is not None:
+        print(f'listening on {args.unix}', file=sys.stderr)
+    else:
+        print(f'listening on {args.host}:{args.port}', file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve words and names of resident languages over a local socket.')
+    parser.add_argument('--host', default=DEFAULT_HOST, help='address to listen on')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='port to listen on')
+    parser.add_argument('--unix', metavar='PATH', help='listen on this Unix socket instead of TCP')
+    parser.add_argument('--max-languages', type=int, default=DEFAULT_MAX_LANGUAGES,
+                        help='how many languages to keep in memory')
+    parser.add_argument('--batch-window', type=float, default=DEFAULT_BATCH_WINDOW * 1000, metavar='MS',
+                        help='milliseconds to wait for more requests before handling a batch')
+    parser.add_argument('--preload', type=int, nargs='+', default=[], metavar='SEED',
+                        help='generate these languages before accepting requests')
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+# Opt-in counters and timers for the generation hot paths
+#
+# usage:
+#     with instrumentation.collect() as stats:
+#         language.generate_language(seed)
+#     print(stats.to_json())
+#
+# The generators check instrumentation.active before recording anything, so with no collect() block running the only
+# cost is that one check per stage.
+# The stages recorded are
+#     'inventory load'       phonologyGen.get_ipa_inventory() reading the inventory files, which it only does on its
+#                            first call in a process, so this stage only appears when the inventory cache is cold
+#     'consonant selection'  phonologyGen.select_consonants()
+#     'vowel selection'      phonologyGen.select_vowels()
+#     'morpheme build'       morphologyGen.generate_morpheme_from_meaning()
+#     'structure pick'       morphologyGen.generate_syllable() picking the structure of a syllable
+#     'phoneme picks'        morphologyGen.generate_syllable() filling that structure with phonemes
+# Stage times include the stages called inside them, e.g. 'morpheme build' includes its 'structure pick' and
+# 'phoneme picks' time.
+
+import json
+import time
+from contextlib import contextmanager
+
+# the Stats currently collecting, or None when instrumentation is off
+active = None
+
+
+class Stats:
+    def __init__(self):
+        # stage name -> [number of calls, total nanoseconds]
+        self.stages = {}
+        # phoneme kind -> [phonemes picked, picks that had to leave out a phoneme to satisfy the contrasting length]
+        self.picks = {}
+
+    # records one call of stage that started at start_ns, as returned by time.perf_counter_ns()
+    def record_stage(self, stage, start_ns):
+        elapsed = time.perf_counter_ns() - start_ns
+        entry = self.stages.get(stage)
+        if entry is None:
+            self.stages[stage] = [1, elapsed]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+
+    # records one picked phoneme of kind, constrained is True if a phoneme had to be left out of the pick
+    def record_pick(self, kind, constrained):
+        entry = self.picks.get(kind)
+        if entry is None:
+            self.picks[kind] = [1, int(constrained)]
+        else:
+            entry[0] += 1
+            entry[1] += constrained
+
+    def to_dict(self):
+        stages = {}
+        for stage, (calls, total_ns) in self.stages.items():
+            stages[stage] = {'calls': calls, 'total_ms': total_ns / 1e6, 'mean_us': total_ns / calls / 1000}
+        picks = {}
+        for kind, (count, constrained) in self.picks.items():
+            picks[kind] = {'picks': count, 'constrained_picks': constrained,
+                           'constrained_fraction': constrained / count}
+        return {'stages': stages, 'phoneme_picks': picks}
+
+    def to_json(self, indent=2):
+        return json.dumps(self.to_dict(), indent=indent)
+
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.to_json())
+
+
+# turns instrumentation on for the duration of the with block and yields the Stats being collected
+# blocks can be nested, the inner block collects into its own Stats until it ends
+@contextmanager
+def collect():
+    global active
+    previous = active
+    stats = Stats()
+    active = stats
+    try:
+        yield stats
+    finally:
+        active = previous
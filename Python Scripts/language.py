@@ -0,0 +1,76 @@
+# This script generates a whole language from a seed
+
+# generate_language(seed, constraints) always builds the same language for the same seed and constraints,
+# on any machine, so a language can be stored as just its seed and constraints and rebuilt when it is needed.
+# Each stage draws from its own generator made by seeding.stage_rng(), see there for why.
+# Language.word_for() makes the word for any meaning on demand, so a game never has to generate a whole lexicon up
+# front: the word is built from a generator seeded by the language's seed and the meaning, see word_for().
+
+from collections import OrderedDict
+import languageConstraints
+import morphologyGen
+import phonologyGen
+import seeding
+
+
+# how many words word_for() keeps in memory by default
+DEFAULT_WORD_CACHE_SIZE = 1024
+
+
+class Language:
+    def __init__(self, seed, constraints, phonology, morphology, word_cache_size=DEFAULT_WORD_CACHE_SIZE):
+        self.seed = seed
+        self.constraints = constraints
+        # (consonants, vowels) as returned by phonologyGen.generate_phonology()
+        self.phonology = phonology
+        # list of morphologyGen.Morpheme
+        self.morphology = morphology
+        # (meaning, morpheme type) -> Morpheme of the words word_for() made most recently, oldest first
+        self.word_cache_size = word_cache_size
+        self.words = OrderedDict()
+        # phoneme codes -> (meaning, morpheme type) of every pronunciation in use, starting with the morphology's
+        self.pronunciations = {m.phonemes: (m.meaning, m.morphemeType) for m in morphology}
+
+    # returns the morpheme for meaning, making it the first time it is asked for
+    # the morpheme only depends on the seed, the constraints, the phonology and the meaning, so it comes out the same
+    # in every run without generating any other word first. If that pronunciation already belongs to another word,
+    # the word is made again from a generator with the next salt, up to max_retries times, and a RuntimeError is
+    # raised after that. Which of two homophones keeps the pronunciation depends on which was asked for first, and
+    # since every pronunciation handed out is remembered, a word dropped from the cache comes back the same.
+    def word_for(self, meaning, morpheme_type='freeLexical', max_retries=morphologyGen.DEFAULT_MAX_RETRIES):
+        key = (meaning, morpheme_type)
+        morpheme = self.words.get(key)
+        if morpheme is not None:
+            self.words.move_to_end(key)
+            return morpheme
+
+        for salt in range(max_retries + 1):
+            rng = seeding.word_rng(self.seed, morpheme_type, meaning, salt)
+            morpheme = morphologyGen.generate_morpheme_from_meaning(self.phonology, None, morpheme_type, meaning,
+                                                                    self.constraints, rng)
+            owner = self.pronunciations.get(morpheme.phonemes)
+            if owner is None or owner == key:
+                break
+        else:
+            raise RuntimeError(f"could not find an unused pronunciation for '{meaning}' "
+                               f'after {max_retries} retries, the phonology may be too small for this lexicon')
+
+        self.pronunciations[morpheme.phonemes] = key
+        self.words[key] = morpheme
+        if len(self.words) > self.word_cache_size:
+            self.words.popitem(last=False)
+        return morpheme
+
+    def display(self):
+        phonologyGen.display_phonology(self.phonology)
+        morphologyGen.display_morphology(self.morphology)
+
+
+def generate_language(seed, constraints=None, morpheme_count=30):
+    constraints = languageConstraints.parse_constraints(constraints)
+    consonants = phonologyGen.select_consonants(constraints, seeding.stage_rng(seed, 'consonants'))
+    vowels = phonologyGen.select_vowels(constraints, seeding.stage_rng(seed, 'vowels'))
+    phonology = (consonants, vowels)
+    morphology = morphologyGen.generate_morphology(phonology, constraints, morpheme_count,
+                                                   seeding.stage_rng(seed, 'morphology'))
+    return Language(seed, constraints, phonology, morphology)
@@ -0,0 +1,119 @@
+# This script turns the free-text constraints entered in main.ask_for_constraints() into a Constraints object
+
+# Constraints used to be passed around as a list of strings and re-scanned with substring checks every time a
+# generator needed one of them, which meant every syllable paid for parsing every constraint.
+# parse_constraints() does that work once per language, and the generators read the parsed fields directly.
+
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Constraints:
+    # these list all possible cluster sizes in descending order of commonness following a zipfy distribution
+    # these default values should match somewhat to English and other similar languages
+    starting_consonant_cluster_sizes: tuple = (1, 0, 2, 3)
+    vowel_cluster_sizes: tuple = (1, 2, 3)
+    ending_consonant_cluster_sizes: tuple = (0, 1, 2, 3, 4)
+    max_syllables: int = 3
+    contrasting_vowel_length: int = 1
+    contrasting_consonant_length: int = 1
+    # has and no keep the order they were entered in so generation stays reproducible
+    has: tuple = ()
+    no: tuple = ()
+    # None means the inventory size is picked at random
+    consonant_inventory_size: int = None
+    vowel_inventory_size: int = None
+
+
+# maps the text before the ':' of a constraint to the Constraints field it sets
+# both singular and plural spellings of the contrasting length constraints are accepted since
+# print_command_list() has always advertised the plural while the generators looked for the singular
+CONSTRAINT_KEYS = {
+    'no': 'no',
+    'has': 'has',
+    'consonant inventory size': 'consonant_inventory_size',
+    'vowel inventory size': 'vowel_inventory_size',
+    'contrasting vowel length': 'contrasting_vowel_length',
+    'contrasting vowel lengths': 'contrasting_vowel_length',
+    'contrasting consonant length': 'contrasting_consonant_length',
+    'contrasting consonant lengths': 'contrasting_consonant_length',
+    'max syllables in morpheme': 'max_syllables',
+    'starting consonant cluster sizes': 'starting_consonant_cluster_sizes',
+    'vowel cluster sizes': 'vowel_cluster_sizes',
+    'ending consonant cluster sizes': 'ending_consonant_cluster_sizes'
+}
+
+# smallest value each numeric field accepts
+MINIMUM_VALUES = {
+    'consonant_inventory_size': 1,
+    'vowel_inventory_size': 1,
+    'contrasting_vowel_length': 1,
+    'contrasting_consonant_length': 1,
+    'max_syllables': 1,
+    'starting_consonant_cluster_sizes': 0,
+    'vowel_cluster_sizes': 0,
+    'ending_consonant_cluster_sizes': 0
+}
+
+
+# returns a Constraints object built from a list of constraint strings
+# None gives the default constraints and an existing Constraints object is returned as is,
+# so every generator can call this on whatever it was given without re-parsing
+# raises ValueError on the first constraint that cannot be understood
+def parse_constraints(constraints=None):
+    if constraints is None:
+        return Constraints()
+    if isinstance(constraints, Constraints):
+        return constraints
+
+    values = {}
+    has = []
+    no = []
+    for c in constraints:
+        field, value = parse_constraint(c)
+        if field == 'has':
+            if value not in has:
+                has.append(value)
+        elif field == 'no':
+            if value not in no:
+                no.append(value)
+        else:
+            # later constraints override earlier ones
+            values[field] = value
+
+    return Constraints(has=tuple(has), no=tuple(no), **values)
+
+
+# returns (field name, parsed value) for a single constraint string
+def parse_constraint(constraint):
+    if ':' not in constraint:
+        raise ValueError(f"constraint '{constraint}' is missing a ':'")
+    key, value = constraint.split(':', 1)
+    key = ' '.join(key.lower().split())
+    value = value.strip()
+    if key not in CONSTRAINT_KEYS:
+        raise ValueError(f"unknown constraint '{constraint}'")
+    field = CONSTRAINT_KEYS[key]
+
+    if field == 'has' or field == 'no':
+        if value == '':
+            raise ValueError(f"constraint '{constraint}' does not name a phoneme")
+        return field, value
+
+    if field.endswith('cluster_sizes'):
+        sizes = []
+        for s in value.replace(' ', '').split(','):
+            sizes.append(parse_number(constraint, s, MINIMUM_VALUES[field]))
+        return field, tuple(sizes)
+
+    return field, parse_number(constraint, value, MINIMUM_VALUES[field])
+
+
+def parse_number(constraint, text, minimum):
+    try:
+        number = int(text)
+    except ValueError:
+        raise ValueError(f"constraint '{constraint}' expects a whole number but got '{text}'") from None
+    if number < minimum:
+        raise ValueError(f"constraint '{constraint}' must be at least {minimum}")
+    return number
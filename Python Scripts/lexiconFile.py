@@ -0,0 +1,248 @@
+# This script saves a lexicon to a binary file that can be searched without loading it
+
+# write_lexicon_file() writes a list of morphemes to disk and LexiconFile opens that file with mmap, so a game can
+# look up the word for a meaning, or every meaning of a pronunciation, by binary searching the file in place.
+# Only the pages that a lookup touches are ever read, however big the lexicon is.
+#
+# File layout, all numbers little-endian:
+#   header               magic b'GLEX', format version, phoneme and morpheme counts and the offset of every section
+#   phoneme table        string table of ipa_char and descriptive_name for every phoneme code, in code order
+#   phoneme buffer       the phoneme codes of every morpheme back to back, one byte each
+#   phoneme offsets      uint32 per morpheme plus one, morpheme i is buffer[offsets[i]:offsets[i + 1]]
+#   syllable buffer      the syllable lengths of every morpheme back to back, one byte each
+#   syllable offsets     uint32 per morpheme plus one, like the phoneme offsets
+#   morpheme types       one byte per morpheme, an index into morphologyGen.MORPHEME_TYPES
+#   meanings             string table of the meaning of every morpheme
+#   meaning index        uint32 morpheme numbers sorted by meaning
+#   pronunciation index  uint32 morpheme numbers sorted by phoneme codes
+# A string table is a uint32 count, count + 1 uint32 offsets into its data and then the utf-8 data itself.
+
+import mmap
+import struct
+from bisect import bisect_left
+import morphologyGen
+import phonologyGen
+
+MAGIC = b'GLEX'
+VERSION = 1
+# magic, version, phoneme count, morpheme count and the offsets of the ten sections
+HEADER = struct.Struct('<4sHII10Q')
+SECTIONS = ('phoneme_table', 'phoneme_buffer', 'phoneme_offsets', 'syllable_buffer', 'syllable_offsets',
+            'morpheme_types', 'meanings', 'meaning_index', 'pronunciation_index', 'end')
+UINT32 = struct.Struct('<I')
+
+
+# writes morphemes to a lexicon file at path
+# the morphemes' phoneme codes are the ones of phonologyGen.get_ipa_inventory(), whose table is stored in the file
+def write_lexicon_file(path, morphemes):
+    inventory = phonologyGen.get_ipa_inventory()
+    phonemes = []
+    syllable_lengths = []
+    types = bytearray()
+    meanings = []
+    for m in morphemes:
+        if m.morphemeType not in morphologyGen.MORPHEME_TYPES:
+            raise ValueError(f"morpheme '{m}' has an unknown type '{m.morphemeType}'")
+        phonemes.append(m.phonemes)
+        syllable_lengths.append(m.syllable_lengths)
+        types.append(morphologyGen.MORPHEME_TYPES.index(m.morphemeType))
+        meanings.append(m.meaning.encode('utf-8'))
+
+    phoneme_strings = []
+    for p in inventory.phonemes:
+        phoneme_strings.append(p.ipaChar.encode('utf-8'))
+        phoneme_strings.append(p.descriptiveName.encode('utf-8'))
+
+    morpheme_numbers = range(len(phonemes))
+    sections = [
+        pack_string_table(phoneme_strings),
+        b''.join(phonemes),
+        pack_offsets(phonemes),
+        b''.join(syllable_lengths),
+        pack_offsets(syllable_lengths),
+        bytes(types),
+        pack_string_table(meanings),
+        pack_uint32s(sorted(morpheme_numbers, key=meanings.__getitem__)),
+        pack_uint32s(sorted(morpheme_numbers, key=phonemes.__getitem__))
+    ]
+
+    offsets = []
+    position = HEADER.size
+    for s in sections:
+        offsets.append(position)
+        position += len(s)
+    offsets.append(position)
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(inventory.phonemes), len(phonemes), *offsets))
+        for s in sections:
+            f.write(s)
+
+
+def pack_uint32s(values):
+    return struct.pack(f'<{len(values)}I', *values)
+
+
+# returns count + 1 offsets so item i spans offsets[i]:offsets[i + 1] once the items are joined
+def pack_offsets(items):
+    offsets = [0]
+    for item in items:
+        offsets.append(offsets[-1] + len(item))
+    if offsets[-1] > 0xFFFFFFFF:
+        raise ValueError('lexicon is too large for the lexicon file format')
+    return pack_uint32s(offsets)
+
+
+def pack_string_table(strings):
+    return UINT32.pack(len(strings)) + pack_offsets(strings) + b''.join(strings)
+
+
+# A lexicon file opened with mmap
+# use it as a context manager, or call close() when done
+class LexiconFile:
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, phoneme_count, morpheme_count, *offsets = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise ValueError(f'{path} is not a lexicon file')
+        if version != VERSION:
+            raise ValueError(f'{path} uses lexicon file format version {version}, expected {VERSION}')
+        self.morpheme_count = morpheme_count
+        self.sections = dict(zip(SECTIONS, offsets))
+
+        # the phoneme table is tiny, so it is read once to translate the file's codes into the current inventory's
+        # codes and to split pronunciation strings into phonemes
+        strings = [self.string(self.sections['phoneme_table'], i) for i in range(2 * phoneme_count)]
+        self.phoneme_chars = [s.decode('utf-8') for s in strings[0::2]]
+        inventory = phonologyGen.get_ipa_inventory()
+        self.code_by_char = {c: i for i, c in enumerate(self.phoneme_chars)}
+        self.longest_char = max(len(c) for c in self.phoneme_chars)
+        missing = [c for c in self.phoneme_chars if c not in inventory.code_by_char]
+        if missing:
+            raise ValueError(f'{path} uses phonemes that are not in the IPA inventory: {" ".join(missing)}')
+        self.to_inventory = bytes.maketrans(bytes(range(phoneme_count)),
+                                            bytes(inventory.code_by_char[c] for c in self.phoneme_chars))
+        self.from_inventory = {i: self.code_by_char.get(c) for i, c in enumerate(inventory.phoneme_chars)}
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.morpheme_count
+
+    def uint32(self, section, i):
+        return UINT32.unpack_from(self.data, self.sections[section] + 4 * i)[0]
+
+    # returns item i of a buffer described by an offsets section
+    def slice(self, buffer_section, offsets_section, i):
+        start = self.sections[buffer_section]
+        return self.data[start + self.uint32(offsets_section, i):start + self.uint32(offsets_section, i + 1)]
+
+    # returns string i of the string table at offset as bytes
+    def string(self, offset, i):
+        count = UINT32.unpack_from(self.data, offset)[0]
+        start, end = struct.unpack_from('<2I', self.data, offset + 4 + 4 * i)
+        data = offset + 4 + 4 * (count + 1)
+        return self.data[data + start:data + end]
+
+    # phoneme codes of morpheme i, in the file's own codes
+    def file_phonemes(self, i):
+        return self.slice('phoneme_buffer', 'phoneme_offsets', i)
+
+    def meaning(self, i):
+        return self.string(self.sections['meanings'], i).decode('utf-8')
+
+    def morpheme_type(self, i):
+        return morphologyGen.MORPHEME_TYPES[self.data[self.sections['morpheme_types'] + i]]
+
+    def pronunciation(self, i):
+        return ''.join(self.phoneme_chars[c] for c in self.file_phonemes(i))
+
+    # returns morpheme i as a morphologyGen.Morpheme
+    def morpheme(self, i):
+        return morphologyGen.Morpheme.from_phonemes(self.file_phonemes(i).translate(self.to_inventory),
+                                                    self.slice('syllable_buffer', 'syllable_offsets', i),
+                                                    self.morpheme_type(i), self.meaning(i))
+
+    # returns the numbers of the morphemes whose sort key equals key, found by binary search of an index section
+    def search(self, index_section, key_of, key):
+        keys = IndexKeys(self, index_section, key_of)
+        first = bisect_left(keys, key)
+        output = []
+        for position in range(first, len(keys)):
+            if keys[position] != key:
+                break
+            output.append(self.uint32(index_section, position))
+        return output
+
+    # returns every morpheme with this meaning
+    def words_for(self, meaning):
+        numbers = self.search('meaning_index', lambda i: self.string(self.sections['meanings'], i),
+                              meaning.encode('utf-8'))
+        return [self.morpheme(i) for i in numbers]
+
+    # returns the morpheme for this meaning, or None if the lexicon has no word for it
+    def word_for(self, meaning):
+        words = self.words_for(meaning)
+        return words[0] if words else None
+
+    # returns every morpheme pronounced as form
+    # form can be an IPA string, a Morpheme or bytes of IPA inventory codes
+    def find_pronunciation(self, form):
+        if isinstance(form, str):
+            codes = self.split_pronunciation(form)
+        else:
+            if isinstance(form, morphologyGen.Morpheme):
+                form = form.phonemes
+            codes = self.from_inventory_codes(form)
+        if codes is None:
+            return []
+        return [self.morpheme(i) for i in self.search('pronunciation_index', self.file_phonemes, codes)]
+
+    # returns the file's phoneme codes for bytes of IPA inventory codes, or None if one of them is not in the file
+    def from_inventory_codes(self, form):
+        codes = bytearray()
+        for c in form:
+            code = self.from_inventory.get(c)
+            if code is None:
+                return None
+            codes.append(code)
+        return bytes(codes)
+
+    # returns the file's phoneme codes for an IPA string, matching the longest phoneme at every position,
+    # or None if part of the string is not a phoneme of the file
+    def split_pronunciation(self, form):
+        codes = bytearray()
+        position = 0
+        while position < len(form):
+            for length in range(min(self.longest_char, len(form) - position), 0, -1):
+                code = self.code_by_char.get(form[position:position + length])
+                if code is not None:
+                    codes.append(code)
+                    position += length
+                    break
+            else:
+                return None
+        return bytes(codes)
+
+
+# The sort keys of an index section as a read-only sequence, so bisect can search the file directly
+class IndexKeys:
+    def __init__(self, lexicon, index_section, key_of):
+        self.lexicon = lexicon
+        self.index_section = index_section
+        self.key_of = key_of
+
+    def __len__(self):
+        return len(self.lexicon)
+
+    def __getitem__(self, position):
+        return self.key_of(self.lexicon.uint32(self.index_section, position))
@@ -0,0 +1,91 @@
+# This script generates a lexicon for a list of meanings from the command line
+#
+# usage: python lexiconGen.py glosses.tsv [-o lexicon.tsv] [-c constraints.txt] [--seed N] [--max-retries N]
+#                              [--min-distance N] [--romanize] [--orthography spelling.txt]
+#
+# glosses.tsv has one meaning per line, optionally followed by a tab and a morpheme type
+# (see morphologyGen.read_glosses)
+# constraints.txt has one constraint per line, written the same way as in main.ask_for_constraints()
+# every morpheme is written as a line of meaning, morpheme type and pronunciation separated by tabs as soon as it is
+# generated, so the lexicon never has to fit in memory
+# with --romanize every line also gets the ASCII spelling of the pronunciation (see orthography.py) as a fourth
+# field, and with --orthography spelling.txt the spelling of that orthography file
+# with --binary lexicon.glex the lexicon is also saved as a lexicon file (see lexiconFile.py), which does keep every
+# morpheme in memory until the file is written
+
+import argparse
+import random
+import sys
+import languageConstraints
+import lexiconFile
+import morphologyGen
+import orthography
+import phonologyGen
+
+
+# returns the constraint strings in a constraints file, skipping blank lines and lines starting with '#'
+def read_constraints(path):
+    output = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line != '' and not line.startswith('#'):
+                output.append(line)
+    return output
+
+
+# writes a lexicon line for every morpheme as it is generated and returns how many were written
+# with an orthography.Orthography every line ends with the morpheme's spelling
+def write_lexicon(morphemes, out, spelling=None):
+    count = 0
+    for m in morphemes:
+        if spelling is None:
+            out.write(f'{m.meaning}\t{m.morphemeType}\t{m.pronunciation}\n')
+        else:
+            out.write(f'{m.meaning}\t{m.morphemeType}\t{m.pronunciation}\t{spelling.romanize_codes(m.phonemes)}\n')
+        count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate a lexicon for a list of meanings.')
+    parser.add_argument('glosses', help='file with one meaning per line, optionally followed by a tab and its type')
+    parser.add_argument('-o', '--output', help='file to write the lexicon to (default: standard output)')
+    parser.add_argument('-c', '--constraints', help='file with one constraint per line')
+    parser.add_argument('-b', '--binary', help='also save the lexicon to this lexicon file')
+    parser.add_argument('--seed', type=int, help='seed for the random number generator')
+    parser.add_argument('--max-retries', type=int, default=morphologyGen.DEFAULT_MAX_RETRIES,
+                        help='how many times a morpheme that comes too close is regenerated before giving up')
+    parser.add_argument('--min-distance', type=int, default=1,
+                        help='how many phoneme edits every two morphemes must be apart (default: 1, no homophones)')
+    parser.add_argument('--romanize', action='store_true', help='also write the ASCII spelling of every morpheme')
+    parser.add_argument('--orthography', help='also write the spelling of every morpheme in this orthography file')
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed) if args.seed is not None else None
+    constraint_strings = read_constraints(args.constraints) if args.constraints else []
+    constraints = languageConstraints.parse_constraints(constraint_strings)
+
+    phonology = phonologyGen.generate_phonology(constraints, rng)
+    morphemes = morphologyGen.generate_lexicon(phonology, morphologyGen.read_glosses(args.glosses), constraints,
+                                               args.max_retries, rng, args.min_distance)
+    if args.orthography:
+        spelling = orthography.read_orthography(args.orthography)
+    elif args.romanize:
+        spelling = orthography.Orthography()
+    else:
+        spelling = None
+    if args.binary:
+        morphemes = list(morphemes)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as out:
+            count = write_lexicon(morphemes, out, spelling)
+    else:
+        count = write_lexicon(morphemes, sys.stdout, spelling)
+    if args.binary:
+        lexiconFile.write_lexicon_file(args.binary, morphemes)
+    print(f'generated {count} morphemes', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
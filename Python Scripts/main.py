@@ -1,12 +1,13 @@
 import morphologyGen
 import phonologyGen
+import languageConstraints
 import json
-import matplotlib.pyplot as plt
 import zipf
 
 # from json import JSONEncoder
 # import numpy as np
 
+# writes the consonant inventory back out to newIpaConsonants.json, run it by hand after changing the inventory format
 def update_json_file():
     consonants = phonologyGen.create_all_ipa_consonants()
     output = []
@@ -27,7 +28,7 @@ def update_json_file():
 def ask_for_constraints():
     cons = []
     print("Enter constraints you would like the generator to have. Type 'help' for a list of commands")
-    print('There is no validation yet so incorrectly entered constraints will simply be ignored')
+    print('Constraints are checked as they are entered and incorrectly entered constraints are rejected')
     print("Type 'done' when you are done. Type 'list' for a list of constraints inputted thus far")
     print('...')
     while True:
@@ -40,14 +41,20 @@ def ask_for_constraints():
             for c in cons:
                 print(c)
         else:
+            try:
+                languageConstraints.parse_constraint(inp)
+            except ValueError as e:
+                print(e)
+                continue
             cons.append(inp)
 
 
 def print_command_list():
     print('...')
-    print('no: [restricted phoneme]')
-    print('has: [required phoneme]')
+    print('no: [restricted phoneme or feature, e.g. retroflex]')
+    print('has: [required phoneme or features, e.g. voiceless ejective]')
     print('consonant inventory size: [number (default random)]')
+    print('vowel inventory size: [number (default random)]')
     print('contrasting vowel lengths: [number (default 1)]')
     print('contrasting consonant lengths: [number (default 1)]')
     print('max syllables in morpheme: [number (default 3)]')
@@ -63,6 +70,8 @@ def print_command_list():
 # 	plt.savefig('haha.png')
 
 def test_zipfy_random():
+    # matplotlib takes longer to import than everything else together, so only this test imports it
+    import matplotlib.pyplot as plt
     data = []
     for i in range(10):
         data.append(zipf.zipfy_random(5))
@@ -73,8 +82,8 @@ def test_zipfy_random():
 
 if __name__ == '__main__':
     # test_zipfy_random()
-    update_json_file()
-    constraints = ask_for_constraints()
+    # update_json_file()
+    constraints = languageConstraints.parse_constraints(ask_for_constraints())
     phonology = phonologyGen.generate_phonology(constraints)
     phonologyGen.display_phonology(phonology)
     morphology = morphologyGen.generate_morphology(phonology, constraints)
@@ -1,18 +1,45 @@
+import itertools
 import math
-import random
-import numpy as np
+import time
+from bisect import bisect_right
+from functools import lru_cache
 import zipf
+import instrumentation
+import seeding
+import languageConstraints
+import phonologyGen
+import similarityIndex
 
 
+# Syllables, morphemes and words store their phonemes as bytes of IPA inventory codes rather than lists of IpaSound
+# objects, which keeps a large lexicon small. The pronunciation string is only built the first time it is needed.
 class Syllable:
+    __slots__ = ('phonemes', '_pronunciation')
+
+    # pronunciation can be a list of IpaSounds or the bytes of their inventory codes
     def __init__(self, pronunciation):
-        self.pronunciation = pronunciation
+        if isinstance(pronunciation, (bytes, bytearray)):
+            self.phonemes = bytes(pronunciation)
+        else:
+            self.phonemes = phonologyGen.get_ipa_inventory().encode(pronunciation)
+        self._pronunciation = None
+
+    # the list of IpaSounds in this syllable
+    @property
+    def pronunciation(self):
+        return phonologyGen.get_ipa_inventory().decode(self.phonemes)
 
     def __str__(self):
-        output = ""
-        for s in self.pronunciation:
-            output += str(s)
-        return output
+        if self._pronunciation is None:
+            self._pronunciation = phonologyGen.get_ipa_inventory().pronounce(self.phonemes)
+        return self._pronunciation
+
+
+# morphemeType can be one of these
+MORPHEME_TYPES = ('freeLexical', 'freeFunctional', 'boundPrefix', 'boundAffix')
+
+# how many times generate_lexicon() regenerates a morpheme that came out as a homophone
+DEFAULT_MAX_RETRIES = 100
 
 
 class Morpheme:
@@ -21,179 +48,267 @@ class Morpheme:
     # freeFunctional
     # boundPrefix
     # boundAffix
+    __slots__ = ('phonemes', 'syllable_lengths', 'morphemeType', 'meaning', '_pronunciation')
+
     def __init__(self, syllables, morpheme_type, meaning):
-        self.syllables = syllables
+        self.phonemes = b''.join([s.phonemes for s in syllables])
+        # number of phonemes in each syllable, so the syllables can be rebuilt from phonemes
+        self.syllable_lengths = bytes([len(s.phonemes) for s in syllables])
         self.morphemeType = morpheme_type
         self.meaning = meaning
-        self.pronunciation = ""
-        for s in syllables:
-            self.pronunciation += str(s)
+        self._pronunciation = None
 
-    def __str__(self):
-        output = ""
-        for s in self.pronunciation:
-            output += str(s)
+    # builds a morpheme straight from inventory codes without making Syllable objects first
+    @classmethod
+    def from_phonemes(cls, phonemes, syllable_lengths, morpheme_type, meaning):
+        morpheme = cls.__new__(cls)
+        morpheme.phonemes = bytes(phonemes)
+        morpheme.syllable_lengths = bytes(syllable_lengths)
+        morpheme.morphemeType = morpheme_type
+        morpheme.meaning = meaning
+        morpheme._pronunciation = None
+        return morpheme
+
+    @property
+    def syllables(self):
+        output = []
+        start = 0
+        for length in self.syllable_lengths:
+            output.append(Syllable(self.phonemes[start:start + length]))
+            start += length
         return output
 
+    @property
+    def pronunciation(self):
+        if self._pronunciation is None:
+            self._pronunciation = phonologyGen.get_ipa_inventory().pronounce(self.phonemes)
+        return self._pronunciation
+
+    def __str__(self):
+        return self.pronunciation
+
     def __repr__(self):
         return f'{str(self)} is a morpheme of type {self.morphemeType} with the meaning: {self.meaning}'
 
 
-def generate_morpheme_from_meaning(phonology, morphology, morpheme_type, meaning, constraints=None):
-    # default values
-    max_syllables = 3
-    # check for constraints
-    if constraints is None:
-        constraints = []
-    else:
-        for c in constraints:
-            if 'max syllables in morpheme:' in c:
-                max_syllables = int(c.replace('max syllables in morpheme:', '').strip())
+def generate_morpheme_from_meaning(phonology, morphology, morpheme_type, meaning, constraints=None, rng=None):
+    stats = instrumentation.active
+    if stats is not None:
+        start = time.perf_counter_ns()
+    constraints = languageConstraints.parse_constraints(constraints)
+    max_syllables = constraints.max_syllables
 
     # select a number of syllables skewed towards having fewer syllables using an zipf-y distribution
-    selected_syllable_count = zipf.zipfy_random(max_syllables) + 1
+    selected_syllable_count = zipf.zipfy_random(max_syllables, rng) + 1
 
     # generate syllables
     morph_syllables = []
     for i in range(selected_syllable_count):
-        morph_syllables.append(generate_syllable(phonology, constraints))
+        morph_syllables.append(generate_syllable(phonology, constraints, rng))
 
-    return Morpheme(morph_syllables, morpheme_type, meaning)
+    morpheme = Morpheme(morph_syllables, morpheme_type, meaning)
+    if stats is not None:
+        stats.record_stage('morpheme build', start)
+    return morpheme
 
 
-def generate_syllable_from_structure(phonology, structure, constraints=None):
+def generate_syllable_from_structure(phonology, structure, constraints=None, rng=None):
     # Note: the structure parameter here looks very similar to other representations of syllable structure but differ
     # in a meaningful way It is still a string of 'c' and 'v', but this representation allows for multiple v's in a
     # row representative of diphthongs, triphthongs, or lengthened vowels. Most other representations of vowel
     # structures you will encounter will use one 'v' for those cases
-    if constraints is None:
-        constraints = []
+    stats = instrumentation.active
+    if stats is not None:
+        start = time.perf_counter_ns()
+    constraints = languageConstraints.parse_constraints(constraints)
+    rng = seeding.python_rng(rng)
     pronunciation = []
     consonants = phonology[0]
     vowels = phonology[1]
 
-    # constraints checking
-    contrasting_vowel_lengths = 1
-    contrasting_consonant_lengths = 1
-    for c in constraints:
-        if "contrasting vowel length:" in c:
-            contrasting_vowel_lengths = int(c.replace("contrasting vowel length:", "").trim())
-        elif "contrasting consonant length:" in c:
-            contrasting_consonant_lengths = int(c.replace("contrasting consonant length:", "").trim())
+    contrasting_vowel_lengths = constraints.contrasting_vowel_length
+    contrasting_consonant_lengths = constraints.contrasting_consonant_length
 
     for sound in structure:
+        # the contrasting length rule: a phoneme may not be picked if the previous contrasting length phonemes are all
+        # that same phoneme, so rather than drawing until that is not the case the repeated phoneme is left out of
+        # the draw, which takes exactly one draw per phoneme
+        # consonants look back once two phonemes have been placed, vowels once more than contrasting length have
         if sound == 'c':
-            # used for validating constraints
-            picked_consonant = None
-            need_repick = True
-            while need_repick:
-                picked_consonant = consonants[math.floor(random.random() * len(consonants))]
-                # check if the previous contrastingConsonantLengths number of consonants are the same
-                if len(pronunciation) < 2:
-                    need_repick = False
-                else:
-                    # start from end of list and iterate backwards contrasingConsonantLenghths times
-                    for i in range(len(pronunciation) - 1, len(pronunciation) - (contrasting_consonant_lengths + 1),
-                                   -1):
-                        if pronunciation[i] != picked_consonant:
-                            need_repick = False
-                            break
+            forbidden = None
+            if len(pronunciation) >= 2:
+                forbidden = repeated_phoneme(pronunciation, structure, 'c',
+                                             min(contrasting_consonant_lengths, len(pronunciation)))
+            picked_consonant = pick_phoneme(consonants, forbidden, rng, 'consonant')
+            if stats is not None:
+                stats.record_pick('consonant', forbidden is not None)
             pronunciation.append(picked_consonant)
-        picked_vowel = None
         if sound == 'v':
-            # repick vowels until constraints satisfied
-            # used for validating constraints
-            need_repick = True
-            while need_repick:
-                picked_vowel = vowels[math.floor(random.random() * len(vowels))]
-                # check if the previous contrastingVowelLengths number of vowels are the same
-                if len(pronunciation) <= contrasting_vowel_lengths:
-                    need_repick = False
-                    break
-                else:
-                    # start from end of list and iterate backwards contrasingVowelLenghths times
-                    for i in range(len(pronunciation) - 1, len(pronunciation) - (contrasting_vowel_lengths + 1), -1):
-                        if pronunciation[i] != picked_vowel:
-                            need_repick = False
-                            break
+            forbidden = None
+            if len(pronunciation) > contrasting_vowel_lengths:
+                forbidden = repeated_phoneme(pronunciation, structure, 'v', contrasting_vowel_lengths)
+            picked_vowel = pick_phoneme(vowels, forbidden, rng, 'vowel')
+            if stats is not None:
+                stats.record_pick('vowel', forbidden is not None)
             pronunciation.append(picked_vowel)
+    if stats is not None:
+        stats.record_stage('phoneme picks', start)
     return Syllable(pronunciation)
 
 
-def generate_syllable(phonology, constraints=None):
-    # default values
-    # these list all possible cluster sizes in descending order of commonness following a zipfy distribution
-    # these default values should match somewhat to English and other similar languages
-    possible_starting_consonant_cluster_sizes = [1, 0, 2, 3]
-    possible_vowel_cluster_sizes = [1, 2, 3]
-    possible_ending_consonant_cluster_sizes = [0, 1, 2, 3, 4]
-    if constraints is None:
-        constraints = []
-    else:
-        for c in constraints:
-            if 'starting consonant cluster sizes:' in c:
-                input_strings = c.replace('starting consonant cluster sizes:', '').replace(' ', '').split(',')
-                possible_starting_consonant_cluster_sizes = []
-                for s in input_strings:
-                    possible_starting_consonant_cluster_sizes.append(int(s))
-            elif 'vowel cluster sizes:' in c:
-                input_strings = c.replace('vowel cluster sizes:', '').replace(' ', '').split(',')
-                possible_vowel_cluster_sizes = []
-                for s in input_strings:
-                    possible_vowel_cluster_sizes.append(int(s))
-            elif 'ending consonant cluster sizes:' in c:
-                input_strings = c.replace('ending consonant cluster sizes:', '').replace(' ', '').split(',')
-                possible_ending_consonant_cluster_sizes = []
-                for s in input_strings:
-                    possible_ending_consonant_cluster_sizes.append(int(s))
-
-    # using a zipfy distribution that feels more natural than other distributions tested
-    # tested uniform and exponential distributions
-    starting_possibilities = len(possible_starting_consonant_cluster_sizes)
-    if starting_possibilities == 1:
-        starting_cluster_size = possible_starting_consonant_cluster_sizes[0]
-    elif starting_possibilities > 1:
-        starting_cluster_size = possible_starting_consonant_cluster_sizes[zipf.zipfy_random(starting_possibilities)]
-    else:
-        raise 'possible_starting_consonant_cluster_sizes empty'
+# returns the phoneme of kind ('c' or 'v') that fills the last window places of pronunciation, or None if they are not
+# all the same phoneme of that kind
+def repeated_phoneme(pronunciation, structure, kind, window):
+    last = len(pronunciation) - 1
+    for i in range(last, last - window, -1):
+        if structure[i] != kind or pronunciation[i] != pronunciation[last]:
+            return None
+    return pronunciation[last]
 
-    vowel_possibilities = len(possible_vowel_cluster_sizes)
-    if vowel_possibilities == 1:
-        vowel_cluster_size = possible_vowel_cluster_sizes[0]
-    elif vowel_possibilities > 1:
-        vowel_cluster_size = possible_vowel_cluster_sizes[zipf.zipfy_random(vowel_possibilities)]
-    else:
-        raise 'possible_vowel_cluster_sizes empty'
 
-    ending_possibilities = len(possible_ending_consonant_cluster_sizes)
-    if ending_possibilities == 1:
-        ending_cluster_size = possible_ending_consonant_cluster_sizes[0]
-    elif ending_possibilities > 1:
-        ending_cluster_size = possible_ending_consonant_cluster_sizes[zipf.zipfy_random(ending_possibilities)]
-    else:
-        raise 'possible_ending_consonant_cluster_sizes empty'
+# picks one of sounds uniformly at random, leaving out forbidden unless it is None
+# raises ValueError if there is nothing left to pick
+def pick_phoneme(sounds, forbidden, rng, kind):
+    if len(sounds) == 0:
+        raise ValueError(f'phonology has no {kind}s to build syllables from')
+    if forbidden is None:
+        return sounds[math.floor(rng.random() * len(sounds))]
+    if len(sounds) == 1:
+        raise ValueError(f'the contrasting {kind} length rule cannot be met with a single {kind}')
+    # draw from every sound but the last one and swap the forbidden sound for the last one if it comes up,
+    # which leaves every allowed sound equally likely
+    picked = sounds[math.floor(rng.random() * (len(sounds) - 1))]
+    if picked == forbidden:
+        picked = sounds[-1]
+    return picked
+
+
+def generate_syllable(phonology, constraints=None, rng=None):
+    stats = instrumentation.active
+    if stats is not None:
+        start = time.perf_counter_ns()
+    constraints = languageConstraints.parse_constraints(constraints)
+    rng = seeding.python_rng(rng)
+    structure = get_structure_table(constraints.starting_consonant_cluster_sizes, constraints.vowel_cluster_sizes,
+                                    constraints.ending_consonant_cluster_sizes).pick(rng)
+    if stats is not None:
+        stats.record_stage('structure pick', start)
+
+    return generate_syllable_from_structure(phonology, structure, constraints, rng)
+
+
+# Every syllable structure a language can have with its probability, built once per set of cluster sizes
+# The starting consonant, vowel and ending consonant cluster sizes are each picked with a zipfy distribution,
+# so the structure made of the i-th, j-th and k-th sizes has the product of those three zipfy probabilities.
+# Drawing from the joint table takes one random number per syllable instead of one per cluster.
+class StructureTable:
+    def __init__(self, starting_cluster_sizes, vowel_cluster_sizes, ending_cluster_sizes):
+        if len(starting_cluster_sizes) == 0:
+            raise ValueError('possible_starting_consonant_cluster_sizes empty')
+        if len(vowel_cluster_sizes) == 0:
+            raise ValueError('possible_vowel_cluster_sizes empty')
+        if len(ending_cluster_sizes) == 0:
+            raise ValueError('possible_ending_consonant_cluster_sizes empty')
+
+        # using a zipfy distribution that feels more natural than other distributions tested
+        # tested uniform and exponential distributions
+        # the i-th of n sizes has weight n - i, which is what zipf.zipfy_random() gives it
+        self.structures = []
+        self.starting_cluster_sizes = []
+        self.vowel_cluster_sizes = []
+        self.ending_cluster_sizes = []
+        # cumulative[i] is the total weight of the structures before structure i, so every weight is an integer
+        # and the table is exact
+        self.cumulative = [0]
+        for i, starting in enumerate(starting_cluster_sizes):
+            for j, vowel in enumerate(vowel_cluster_sizes):
+                for k, ending in enumerate(ending_cluster_sizes):
+                    weight = ((len(starting_cluster_sizes) - i) * (len(vowel_cluster_sizes) - j)
+                              * (len(ending_cluster_sizes) - k))
+                    self.structures.append('c' * starting + 'v' * vowel + 'c' * ending)
+                    self.starting_cluster_sizes.append(starting)
+                    self.vowel_cluster_sizes.append(vowel)
+                    self.ending_cluster_sizes.append(ending)
+                    self.cumulative.append(self.cumulative[-1] + weight)
+        self.total = self.cumulative[-1]
+
+    def __len__(self):
+        return len(self.structures)
 
-    # generate structure to pass to generateSyllableFromStructure()
-    structure = ""
-    for i in range(starting_cluster_size):
-        structure += 'c'
-    for i in range(vowel_cluster_size):
-        structure += 'v'
-    for i in range(ending_cluster_size):
-        structure += 'c'
+    # returns the probability of structure number index
+    def probability(self, index):
+        return (self.cumulative[index + 1] - self.cumulative[index]) / self.total
 
-    return generate_syllable_from_structure(phonology, structure, constraints)
+    # returns one random structure string
+    def pick(self, rng=None):
+        return self.structures[self.pick_index(rng)]
 
+    def pick_index(self, rng=None):
+        return bisect_right(self.cumulative, seeding.python_rng(rng).random() * self.total) - 1
+
+    # returns a numpy array of size random structure numbers
+    def sample(self, size, rng=None):
+        import numpy as np
+        rand = seeding.numpy_rng(rng).random(size) * self.total
+        return np.searchsorted(np.asarray(self.cumulative), rand, side='right') - 1
+
+
+# returns the StructureTable for these cluster sizes, building it the first time it is asked for
+@lru_cache(maxsize=None)
+def get_structure_table(starting_cluster_sizes, vowel_cluster_sizes, ending_cluster_sizes):
+    return StructureTable(starting_cluster_sizes, vowel_cluster_sizes, ending_cluster_sizes)
+
+
+def generate_morphology(phonology, constraints=None, count=30, rng=None, min_distance=1):
+    return list(generate_lexicon(phonology, itertools.repeat(('nomeaning', 'freeLexical'), count), constraints,
+                                 rng=rng, min_distance=min_distance))
+
+
+# yields one morpheme for every (meaning, morpheme type) pair in glosses, in order
+# glosses can be any iterable, e.g. read_glosses() on a large file, and morphemes are yielded as they are made,
+# so only the set of pronunciations already used is kept in memory
+# every morpheme gets a pronunciation at least min_distance phoneme edits (insertions, deletions or substitutions)
+# away from every earlier one, the default of 1 only rules out homophones; a morpheme that comes too close is
+# regenerated up to max_retries times before giving up with a RuntimeError
+# with a min_distance above 1 the earlier pronunciations are kept in a similarityIndex.EditDistanceIndex, so a
+# lexicon still takes time roughly linear in its size
+def generate_lexicon(phonology, glosses, constraints=None, max_retries=DEFAULT_MAX_RETRIES, rng=None, min_distance=1):
+    constraints = languageConstraints.parse_constraints(constraints)
+    if min_distance < 1:
+        raise ValueError('min_distance must be at least 1')
+    # pronunciations are compared by their phoneme codes, which are shorter than the IPA strings
+    if min_distance == 1:
+        used_pronunciations = set()
+    else:
+        used_pronunciations = similarityIndex.EditDistanceIndex(min_distance - 1)
+    for meaning, morpheme_type in glosses:
+        for attempt in range(max_retries + 1):
+            morpheme = generate_morpheme_from_meaning(phonology, None, morpheme_type, meaning, constraints, rng)
+            if morpheme.phonemes not in used_pronunciations:
+                break
+        else:
+            raise RuntimeError(f"could not find a pronunciation at least {min_distance} edits from the others for "
+                               f"'{meaning}' after {max_retries} retries, the phonology may be too small for this "
+                               f'lexicon')
+        used_pronunciations.add(morpheme.phonemes)
+        yield morpheme
 
-def generate_morphology(phonology, constraints=None):
-    if constraints is None:
-        constraints = []
-    morphology = []
-    for i in range(30):
-        morphology.append(
-            generate_morpheme_from_meaning(phonology, morphology, "freeLexical", "nomeaning", constraints))
 
-    return morphology
+# yields (meaning, morpheme type) pairs from a gloss file without reading the whole file into memory
+# every line holds a meaning, optionally followed by a tab and its morpheme type (default freeLexical)
+# blank lines and lines starting with '#' are skipped
+def read_glosses(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.rstrip('\r\n')
+            if line.strip() == '' or line.startswith('#'):
+                continue
+            fields = line.split('\t')
+            meaning = fields[0].strip()
+            morpheme_type = fields[1].strip() if len(fields) > 1 and fields[1].strip() != '' else 'freeLexical'
+            if morpheme_type not in MORPHEME_TYPES:
+                raise ValueError(f"{path}:{line_number}: unknown morpheme type '{morpheme_type}'")
+            yield meaning, morpheme_type
 
 
 def display_morphology(morphology):
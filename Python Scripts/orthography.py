@@ -0,0 +1,200 @@
+# This script spells IPA pronunciations with a romanization, plain ASCII by default
+#
+# usage: python orthography.py corpus.txt [-o romanized.txt] [--orthography spelling.txt]
+#
+# An Orthography maps every IPA symbol of the inventory to a spelling. It is compiled once into
+#     a str.maketrans() table for the symbols that are a single code point, e.g. ʃ -> sh
+#     one regular expression that matches the symbols made of several code points, e.g. m̥ or k͡ǃ, longest first
+# so a text is romanized by one regex split and str.translate() over the pieces in between, both of which run in C.
+# Pronunciations stored as bytes of inventory codes skip the regex altogether, every code is looked up in a tuple.
+# Many pronunciations are transliterated at once by joining them with newlines and transliterating the joined text,
+# which costs one pass instead of one call per pronunciation, so no spelling may contain a newline. The spelling
+# rules then run over each pronunciation on its own.
+#
+# The default spelling of a symbol decomposes it (NFD), drops its combining diacritics like the ring in m̥ or the tie
+# bar in k͡p and spells the letters left with ASCII_LETTERS.
+# A language can override the spelling of any symbol and add spelling rules, regular expression substitutions run in
+# order over every romanized line on its own, e.g. 'ngg -> ng', so a batch is spelled exactly like its items one by
+# one. An orthography file holds both, one per line:
+#     ʃ = sch
+#     ngg -> ng
+# blank lines and lines starting with '#' are skipped.
+
+import argparse
+import re
+import sys
+import unicodedata
+import phonologyGen
+
+# ASCII spellings of the IPA letters that are not ASCII themselves, diacritics are dropped before these are used
+ASCII_LETTERS = {
+    'ɱ': 'm', 'ɳ': 'n', 'ɲ': 'ny', 'ŋ': 'ng', 'ɴ': 'ng',
+    'ʈ': 't', 'ɖ': 'd', 'ɟ': 'gy', 'ɡ': 'g', 'ɢ': 'g', 'ʡ': "'", 'ʔ': "'",
+    'ʃ': 'sh', 'ʒ': 'zh', 'ʂ': 'sh', 'ʐ': 'zh', 'ɕ': 'sy', 'ʑ': 'zy',
+    'ɸ': 'f', 'β': 'v', 'θ': 'th', 'ð': 'dh', 'ʝ': 'y', 'ɣ': 'gh', 'χ': 'kh', 'ʁ': 'r', 'ħ': 'h', 'ʕ': "'", 'ɦ': 'h',
+    'ʋ': 'v', 'ɹ': 'r', 'ɻ': 'r', 'ɰ': 'w', 'ⱱ': 'v', 'ɾ': 'r', 'ɽ': 'r', 'ʙ': 'b', 'ʀ': 'r', 'ʜ': 'h', 'ʢ': "'",
+    'ɬ': 'hl', 'ɮ': 'dl', 'ꞎ': 'hl', 'ɭ': 'l', 'ʎ': 'ly', 'ʟ': 'l', 'ɺ': 'l',
+    'ʘ': 'p', 'ǀ': 'c', 'ǃ': 'q', 'ǂ': 'c', 'ǁ': 'x',
+    'ɓ': 'b', 'ɗ': 'd', 'ʄ': 'j', 'ɠ': 'g', 'ʛ': 'g',
+    'ɨ': 'i', 'ʉ': 'u', 'ɯ': 'u', 'ɪ': 'i', 'ʏ': 'y', 'ʊ': 'u',
+    'ø': 'oe', 'ɘ': 'e', 'ɵ': 'o', 'ɤ': 'o', 'ə': 'e',
+    'ɛ': 'e', 'œ': 'oe', 'ɜ': 'e', 'ɞ': 'o', 'ʌ': 'u', 'ɔ': 'o',
+    'æ': 'ae', 'ɐ': 'a', 'ɑ': 'a', 'ɒ': 'o',
+    # modifier letters: the ejective apostrophe and the raised diacritic
+    'ʼ': "'", '˔': ''
+}
+
+
+# returns the default ASCII spelling of an IPA symbol
+def ascii_spelling(symbol):
+    letters = unicodedata.normalize('NFD', symbol)
+    return ''.join(ASCII_LETTERS.get(c, c) for c in letters if not unicodedata.combining(c))
+
+
+# A compiled mapping from IPA symbols to spellings
+# spellings overrides the ASCII spelling of any symbol, and may add symbols the inventory does not have
+# rules are (pattern, replacement) pairs run in order over every romanized line, with re.sub() semantics
+class Orthography:
+    def __init__(self, spellings=None, rules=()):
+        inventory = phonologyGen.get_ipa_inventory()
+        self.spellings = {symbol: ascii_spelling(symbol) for symbol in inventory.phoneme_chars}
+        if spellings is not None:
+            self.spellings.update(spellings)
+        for symbol, spelling in self.spellings.items():
+            if symbol == '':
+                raise ValueError('an IPA symbol to spell can not be empty')
+            if '\n' in spelling:
+                raise ValueError(f"the spelling of '{symbol}' contains a newline")
+        self.rules = []
+        for pattern, replacement in rules:
+            # a rule never sees a newline, one that writes one would split a line in two
+            if '\n' in replacement or '\\n' in replacement:
+                raise ValueError(f"the replacement of spelling rule '{pattern}' contains a newline")
+            self.rules.append((re.compile(pattern), replacement))
+        self.rules = tuple(self.rules)
+
+        self.table = str.maketrans({s: spelling for s, spelling in self.spellings.items() if len(s) == 1})
+        longer = sorted((s for s in self.spellings if len(s) > 1), key=len, reverse=True)
+        # the capturing group makes split() keep the matched symbols at the odd indices
+        self.pattern = re.compile('(' + '|'.join(map(re.escape, longer)) + ')') if longer else None
+        # inventory code -> spelling, for pronunciations stored as bytes
+        self.code_spellings = tuple(self.spellings[s] for s in inventory.phoneme_chars)
+
+    # returns text with every IPA symbol spelled, characters that are not symbols are kept
+    def romanize(self, text):
+        return self.apply_rules(self.transliterate(text))
+
+    # returns text with every IPA symbol spelled, without running the spelling rules
+    def transliterate(self, text):
+        if self.pattern is None:
+            output = text.translate(self.table)
+        else:
+            parts = self.pattern.split(text)
+            table = self.table
+            spellings = self.spellings
+            parts[0::2] = [p.translate(table) for p in parts[0::2]]
+            parts[1::2] = [spellings[p] for p in parts[1::2]]
+            output = ''.join(parts)
+        return output
+
+    # returns the spelling of a pronunciation stored as bytes of inventory codes
+    def romanize_codes(self, codes):
+        return self.apply_line_rules(''.join(map(self.code_spellings.__getitem__, codes)))
+
+    # returns the spellings of many texts, none of which may contain a newline, transliterated in one pass
+    # every text gets the same spelling romanize() would give it
+    def romanize_all(self, texts):
+        texts = list(texts)
+        if not texts:
+            return []
+        output = self.transliterate('\n'.join(texts)).split('\n')
+        if len(output) != len(texts):
+            raise ValueError('a text to romanize in a batch contains a newline')
+        if self.rules:
+            output = [self.apply_line_rules(text) for text in output]
+        return output
+
+    # returns the spellings of many morphemes, words or other objects with phonemes
+    # every morpheme gets the same spelling romanize_codes() would give it
+    def romanize_lexicon(self, morphemes):
+        code_spellings = self.code_spellings
+        output = [''.join(map(code_spellings.__getitem__, m.phonemes)) for m in morphemes]
+        if self.rules:
+            output = [self.apply_line_rules(text) for text in output]
+        return output
+
+    # romanizes the text read from source to out, about chunk_size characters at a time so a corpus of any size
+    # fits in memory, and returns how many lines were written
+    def romanize_stream(self, source, out, chunk_size=1 << 20):
+        count = 0
+        while True:
+            # whole lines only, so no symbol is cut in half
+            lines = source.readlines(chunk_size)
+            if not lines:
+                break
+            out.write(self.romanize(''.join(lines)))
+            count += len(lines)
+        return count
+
+    def romanize_file(self, in_path, out_path, chunk_size=1 << 20):
+        with open(in_path, 'r', encoding='utf-8') as source, open(out_path, 'w', encoding='utf-8') as out:
+            return self.romanize_stream(source, out, chunk_size)
+
+    # runs the spelling rules over every line of text on its own
+    def apply_rules(self, text):
+        if not self.rules:
+            return text
+        if '\n' not in text:
+            return self.apply_line_rules(text)
+        lines = text.split('\n')
+        # the newline that ends the last line does not start another one
+        end = lines.pop() if text.endswith('\n') else None
+        lines = [self.apply_line_rules(line) for line in lines]
+        if end is not None:
+            lines.append(end)
+        return '\n'.join(lines)
+
+    def apply_line_rules(self, line):
+        for pattern, replacement in self.rules:
+            line = pattern.sub(replacement, line)
+        return line
+
+
+# returns the Orthography in an orthography file, see the top of this file for its format
+def read_orthography(path):
+    spellings = {}
+    rules = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if line == '' or line.startswith('#'):
+                continue
+            if '->' in line:
+                pattern, replacement = line.split('->', 1)
+                rules.append((pattern.strip(), replacement.strip()))
+            elif '=' in line:
+                symbol, spelling = line.split('=', 1)
+                spellings[symbol.strip()] = spelling.strip()
+            else:
+                raise ValueError(f"{path}:{line_number}: expected 'symbol = spelling' or 'pattern -> replacement'")
+    return Orthography(spellings, rules)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Romanize the IPA in a text file.')
+    parser.add_argument('corpus', help='text file to romanize')
+    parser.add_argument('-o', '--output', help='file to write the romanized text to (default: standard output)')
+    parser.add_argument('--orthography', help='orthography file with spellings and spelling rules')
+    args = parser.parse_args(argv)
+
+    orthography = read_orthography(args.orthography) if args.orthography else Orthography()
+    if args.output:
+        count = orthography.romanize_file(args.corpus, args.output)
+    else:
+        with open(args.corpus, 'r', encoding='utf-8') as source:
+            count = orthography.romanize_stream(source, sys.stdout)
+    print(f'romanized {count} lines', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,19 +2,24 @@
 
 # Current Version:
 # The generator first decides how many consonants are going to be in this phonology
-# Then it picks the most common consonants at random
-# After the list of common consonants are exhausted, it picks the other consonants at random
+# Then it picks consonants at random, weighted so the most common consonants are nearly always picked first
 # It decides either to use a 3 vowel system or a 5 vowel system
 # These systems have predetermined vowels
+# Vowel systems of any other size keep adding the vowel farthest from the vowels already picked
 
 # The vowel system does not include the diphthongs that can be created from them
 # diphthongs, triphthongs, and lengthened vowels will be handled as multiple vowels in a row by morphology
 
-import numpy as np
 import random
 import math
 import json
-from tabulate import tabulate
+import os
+import time
+from functools import lru_cache
+from types import MappingProxyType
+import instrumentation
+import languageConstraints
+import seeding
 
 
 class IpaSound:
@@ -102,6 +107,7 @@ def create6VowelSystem():
 
 
 def selectConsonantsNormal(allConsonants=[]):
+    import numpy as np
     # Follows distribution shown here: https://wals.info/chapter/1
 
     # populate allConsonants with all IPA consonants if no input
@@ -172,6 +178,7 @@ def displayPhonology(phonology):
     displayNonpulmonicConsonants(consonants)
 
 def displayPulmonicConsonants(consonants):
+    from tabulate import tabulate
     pulmonicConsonants = [["", "Bilabial", "Labio-dental", "Linguo-labial", "Dental", "Alveolar", "Post-alveolar", "Retro-flex", "Palatal", "Velar", "Uvular", "Pharyngeal/epiglottal", "Glottal"]]
     pulmonicConsonants.append(["Nasal", ["", ""], ["", ""], ["", ""], ["", ""], ["", ""], ["", ""], ["", ""], ["", ""], ["", ""], ["", ""], ["", ""], ["", ""]])
     pulmonicConsonants.append(["Plosive", ["", ""], ["", ""], ["", ""], ["", ""], ["", ""], ["", ""], ["", ""], ["", ""], ["", ""], ["", ""], ["", ""], ["", ""]])
@@ -227,11 +234,10 @@ def displayPulmonicConsonants(consonants):
             else:
                 print(f'{c.descriptiveName} has a phonation that is not set correctly')
 
-    trim_table(pulmonicConsonants)
-
     print(tabulate(pulmonicConsonants, tablefmt="simple_grid"))
 
 def displayNonpulmonicConsonants(consonants):
+    from tabulate import tabulate
     output = [["", "", "Bilabial", "Labio-dental", "Linguo-labial", "Dental", "Alveolar", "Post-alveolar", "Retro-flex", "Palatal", "Velar", "Uvular", "Pharyngeal/epiglottal", "Glottal"]]
     output.append(["Ejective", "Stop"])
     output.append(["", "Fricative"])
@@ -270,17 +276,195 @@ def displayNonpulmonicConsonants(consonants):
 
     print(tabulate(output, tablefmt="simple_grid"))
 
-def create_all_ipa_consonants():
+# the IPA inventory files live next to this script, so they are found no matter what the working directory is
+SCRIPT_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+IPA_CONSONANTS_PATH = os.path.join(SCRIPT_DIRECTORY, 'ipaConsonants.json')
+IPA_VOWELS_PATH = os.path.join(SCRIPT_DIRECTORY, 'ipaVowels.json')
+
+# vowels making up the predetermined vowel systems, in the order they appear in ipaVowels.json
+THREE_VOWEL_SYSTEM = ('i', 'u', 'a')
+FIVE_VOWEL_SYSTEM = ('i', 'u', 'e', 'o', 'a')
+
+
+# Every IPA consonant and vowel the generators know about, loaded once per process by get_ipa_inventory()
+# The sounds are kept in tuples and all lookups are read-only mappings so the shared inventory cannot be changed
+# by accident. Lists handed out by create_all_ipa_consonants() and create_all_ipa_vowels() are copies that callers
+# are free to modify.
+class IpaInventory:
+    def __init__(self, consonants, vowels):
+        self.consonants = tuple(consonants)
+        self.vowels = tuple(vowels)
+
+        # every sound also has a code that fits in a byte: consonants come first, then vowels
+        # syllables, morphemes and words store their pronunciation as bytes of these codes
+        self.phonemes = self.consonants + self.vowels
+        if len(self.phonemes) > 256:
+            raise ValueError('IPA inventory has too many sounds to encode in a byte')
+        self.phoneme_chars = tuple(p.ipaChar for p in self.phonemes)
+        self.code_by_char = MappingProxyType({p.ipaChar: i for i, p in enumerate(self.phonemes)})
+
+        self.consonant_by_char = MappingProxyType({c.ipaChar: c for c in self.consonants})
+        self.consonant_by_name = MappingProxyType({c.descriptiveName: c for c in self.consonants})
+        self.vowel_by_char = MappingProxyType({v.ipaChar: v for v in self.vowels})
+        self.vowel_by_name = MappingProxyType({v.descriptiveName: v for v in self.vowels})
+
+        # place and manner are lists since a consonant can have several, e.g. a click is both 'click' and 'nasal'
+        self.consonants_by_place = group_sounds(self.consonants, lambda c: c.place)
+        self.consonants_by_manner = group_sounds(self.consonants, lambda c: c.manner)
+        self.consonants_by_phonation = group_sounds(self.consonants, lambda c: [c.phonation])
+        self.consonants_by_sound_type = group_sounds(self.consonants, lambda c: [c.sound_type])
+        self.consonants_by_commonness = group_sounds(self.consonants, lambda c: [c.commonness])
+        self.vowels_by_height = group_sounds(self.vowels, lambda v: [v.height])
+        self.vowels_by_backness = group_sounds(self.vowels, lambda v: [v.backness])
+        self.vowels_by_roundedness = group_sounds(self.vowels, lambda v: [v.roundedness])
+
+        # how likely every consonant is to be picked for an inventory, see consonant_tier() and consonant_weight()
+        self.consonant_tiers = tuple(consonant_tier(c) for c in self.consonants)
+        self.consonant_weights = tuple(consonant_weight(c) for c in self.consonants)
+
+        # sets of sounds are ints used as bitsets: bit i of a consonant mask stands for consonant i and bit i of a
+        # vowel mask for vowel i (a vowel's code minus the number of consonants)
+        # every feature value has a mask, so has: and no: constraints on a whole class of sounds are a single AND
+        self.all_consonants_mask = (1 << len(self.consonants)) - 1
+        self.all_vowels_mask = (1 << len(self.vowels)) - 1
+        self.consonant_feature_masks = feature_masks(self.consonants, [
+            self.consonants_by_place, self.consonants_by_manner, self.consonants_by_phonation,
+            self.consonants_by_sound_type, self.consonants_by_commonness])
+        self.vowel_feature_masks = feature_masks(self.vowels, [
+            self.vowels_by_height, self.vowels_by_backness, self.vowels_by_roundedness])
+
+    # returns the consonant whose ipaChar or descriptiveName is key, or None
+    def find_consonant(self, key):
+        consonant = self.consonant_by_char.get(key)
+        if consonant is None:
+            consonant = self.consonant_by_name.get(key)
+        return consonant
+
+    # returns the vowel whose ipaChar or descriptiveName is key, or None
+    def find_vowel(self, key):
+        vowel = self.vowel_by_char.get(key)
+        if vowel is None:
+            vowel = self.vowel_by_name.get(key)
+        return vowel
+
+    # returns the mask of the consonant whose ipaChar or descriptiveName is key, or of every consonant with the
+    # features in key, e.g. 'retroflex' or 'voiceless ejective', or None if key is neither
+    def consonant_mask(self, key):
+        consonant = self.find_consonant(key)
+        if consonant is not None:
+            return 1 << self.code_by_char[consonant.ipaChar]
+        return class_mask(self.consonant_feature_masks, key)
+
+    # returns the mask of the vowel whose ipaChar or descriptiveName is key, or of every vowel with the features in
+    # key, e.g. 'front' or 'front rounded', or None if key is neither
+    def vowel_mask(self, key):
+        vowel = self.find_vowel(key)
+        if vowel is not None:
+            return 1 << (self.code_by_char[vowel.ipaChar] - len(self.consonants))
+        return class_mask(self.vowel_feature_masks, key)
+
+    # returns (consonant mask, vowel mask) for the key of a has: or no: constraint, either is None if key names no
+    # consonants or no vowels, and raises ValueError if key is neither a sound nor a feature class
+    def constraint_masks(self, key):
+        masks = (self.consonant_mask(key), self.vowel_mask(key))
+        if masks == (None, None):
+            raise ValueError(f"unknown sound or feature class '{key}'")
+        return masks
+
+    # returns the bytes of inventory codes for a list of IpaSounds
+    def encode(self, sounds):
+        code_by_char = self.code_by_char
+        return bytes([code_by_char[s.ipaChar] for s in sounds])
+
+    # returns the list of IpaSounds for bytes of inventory codes
+    def decode(self, codes):
+        phonemes = self.phonemes
+        return [phonemes[c] for c in codes]
+
+    # returns the pronunciation string for bytes of inventory codes
+    def pronounce(self, codes):
+        return ''.join(map(self.phoneme_chars.__getitem__, codes))
+
+
+# returns a read-only dict mapping every feature value to the tuple of sounds that have it
+def group_sounds(sounds, features_of):
+    groups = {}
+    for s in sounds:
+        for feature in features_of(s):
+            groups.setdefault(feature, []).append(s)
+    return MappingProxyType({feature: tuple(members) for feature, members in groups.items()})
+
+
+# returns a read-only dict mapping every feature value in groups to the mask of the sounds that have it
+def feature_masks(sounds, groups):
+    number = {id(s): i for i, s in enumerate(sounds)}
+    masks = {}
+    for group in groups:
+        for feature, members in group.items():
+            mask = 0
+            for s in members:
+                mask |= 1 << number[id(s)]
+            masks[feature_key(feature)] = masks.get(feature_key(feature), 0) | mask
+    return MappingProxyType(masks)
+
+
+# returns the mask of the sounds that have every feature in key, or None if key names an unknown feature
+# key is first looked up as a whole so feature names of more than one word, like 'lateral fricative', still work
+def class_mask(masks, key):
+    mask = masks.get(feature_key(key))
+    if mask is not None:
+        return mask
+    words = key.replace(',', ' ').split()
+    if len(words) < 2:
+        return None
+    mask = -1
+    for word in words:
+        word_mask = masks.get(feature_key(word))
+        if word_mask is None:
+            return None
+        mask &= word_mask
+    return mask
+
+
+# returns feature names the way the feature masks store them, so 'Lateral fricative' finds 'lateralfricative'
+def feature_key(text):
+    return ''.join(c for c in text.lower() if c.isalnum())
+
+
+# returns the numbers of the set bits of mask in ascending order
+def mask_members(mask):
+    output = []
+    while mask:
+        lowest = mask & -mask
+        output.append(lowest.bit_length() - 1)
+        mask ^= lowest
+    return output
+
+
+def count_members(mask):
+    return bin(mask).count('1')
+
+
+# loads the inventory files on the first call and returns the same IpaInventory after that
+@lru_cache(maxsize=None)
+def get_ipa_inventory():
+    stats = instrumentation.active
+    if stats is not None:
+        start = time.perf_counter_ns()
+    inventory = IpaInventory(load_ipa_consonants(), load_ipa_vowels())
+    if stats is not None:
+        stats.record_stage('inventory load', start)
+    return inventory
+
+
+def load_ipa_consonants():
     # TODO: finish adding consonants
     # Create a list with the consonants from this page:
     # https://en.wikipedia.org/wiki/International_Phonetic_Alphabet#Consonants
     # consonants described as 'extremely rare' are excluded
     # consonants described as likely only existing in allophones are also excluded
-    f = open('ipaConsonants.json', 'r')
-    data = f.read()
-    data.encode('unicode_escape')
-    dicts = json.loads(data)
-    f.close()
+    with open(IPA_CONSONANTS_PATH, 'r', encoding='utf-8') as f:
+        dicts = json.load(f)
     output = []
     for d in dicts:
         output.append(
@@ -289,180 +473,482 @@ def create_all_ipa_consonants():
     return output
 
 
-def create_all_ipa_vowels():
-    f = open('ipaVowels.json', 'r')
-    dicts = json.load(f)
-    f.close()
+def load_ipa_vowels():
+    with open(IPA_VOWELS_PATH, 'r', encoding='utf-8') as f:
+        dicts = json.load(f)
     output = []
     for d in dicts:
         output.append(IpaVowel(d['descriptive_name'], d['ipa_char'], d['height'], d['roundedness'], d['backness']))
     return output
 
 
-def create_3_vowel_system():
-    allvowels = create_all_ipa_vowels()
-    output = []
-    for v in allvowels:
-        if v.ipaChar == 'i' or v.ipaChar == 'u' or v.ipaChar == 'a':
-            output.append(v)
-    return output
+def create_all_ipa_consonants():
+    return list(get_ipa_inventory().consonants)
 
 
-def create_5_vowel_system():
-    all_vowels = create_all_ipa_vowels()
-    output = []
-    for v in all_vowels:
-        if v.ipaChar == 'i' or v.ipaChar == 'u' or v.ipaChar == 'e' or v.ipaChar == 'o' or v.ipaChar == 'a':
-            output.append(v)
-    return output
+def create_all_ipa_vowels():
+    return list(get_ipa_inventory().vowels)
+
+
+def create_3_vowel_system():
+    vowel_by_char = get_ipa_inventory().vowel_by_char
+    return [vowel_by_char[c] for c in THREE_VOWEL_SYSTEM]
 
 
-def select_consonants(constraints=None):
+def create_5_vowel_system():
+    vowel_by_char = get_ipa_inventory().vowel_by_char
+    return [vowel_by_char[c] for c in FIVE_VOWEL_SYSTEM]
+
+
+# Consonant inventory size categories from https://wals.info/chapter/1
+# (languages in the sample, smallest size, largest size) of every category but large
+CONSONANT_INVENTORY_SIZE_CATEGORIES = ((89, 6, 14), (122, 15, 18), (201, 19, 25), (94, 26, 33))
+# large inventories (34 - 122) have the remaining languages of the sample
+CONSONANT_INVENTORY_SAMPLE_SIZE = 563
+LARGE_CONSONANT_INVENTORY_MINIMUM = 34
+LARGE_CONSONANT_INVENTORY_RANGE = 89
+# an exponential distribution with scale 0.2 has rate 1 / 0.2
+LARGE_CONSONANT_INVENTORY_SCALE = 0.2
+
+# Consonants are picked for an inventory one commonness tier at a time: every allowed common consonant is picked
+# before any normal one, so small inventories are made of common consonants
+CONSONANT_COMMONNESS_TIERS = ('common', 'normal')
+# Relative weight of a consonant being picked within its tier, ejectives, implosives and clicks are picked less often
+# than plain pulmonics
+CONSONANT_SOUND_TYPE_WEIGHTS = {'pulmonic': 1.0, 'nonpulmonic': 0.5, 'coarticulated': 0.5}
+# added to the sampling keys of every tier after the first in select_consonants_batch(), far more than any key within
+# a tier can be, so the keys of one tier all sort before the next
+CONSONANT_TIER_KEY_OFFSET = 1e6
+
+
+def consonant_weight(consonant):
+    return CONSONANT_SOUND_TYPE_WEIGHTS.get(consonant.sound_type, 1.0)
+
+
+# consonants whose commonness is not one of the tiers go in the last tier
+def consonant_tier(consonant):
+    if consonant.commonness in CONSONANT_COMMONNESS_TIERS:
+        return CONSONANT_COMMONNESS_TIERS.index(consonant.commonness)
+    return len(CONSONANT_COMMONNESS_TIERS) - 1
+
+
+# returns a random consonant inventory size
+# Decide which category we fall under, then pick a random number in that range
+# Every category other than large has a uniform distribution
+# Large has an exponential distribution to make extremely high inventories less likely
+def pick_consonant_inventory_size(rng=None):
+    rng = seeding.python_rng(rng)
+    category = math.floor(rng.random() * CONSONANT_INVENTORY_SAMPLE_SIZE)
+    for languages, smallest, largest in CONSONANT_INVENTORY_SIZE_CATEGORIES:
+        if category < languages:
+            return math.floor(rng.random() * (largest - smallest + 1)) + smallest
+        category -= languages
+    # uses a different distribution to skew selection towards smaller side
+    return (math.floor(rng.expovariate(1 / LARGE_CONSONANT_INVENTORY_SCALE) * LARGE_CONSONANT_INVENTORY_RANGE)
+            + LARGE_CONSONANT_INVENTORY_MINIMUM)
+
+
+# returns a numpy array of size random consonant inventory sizes, following the same distribution as
+# pick_consonant_inventory_size()
+def sample_consonant_inventory_sizes(size, rng=None):
+    import numpy as np
+    rng = seeding.numpy_rng(rng)
+    boundaries = np.cumsum([languages for languages, smallest, largest in CONSONANT_INVENTORY_SIZE_CATEGORIES])
+    smallest = np.array([c[1] for c in CONSONANT_INVENTORY_SIZE_CATEGORIES] + [LARGE_CONSONANT_INVENTORY_MINIMUM])
+    largest = np.array([c[2] for c in CONSONANT_INVENTORY_SIZE_CATEGORIES] + [LARGE_CONSONANT_INVENTORY_MINIMUM])
+    categories = np.searchsorted(boundaries, rng.random(size) * CONSONANT_INVENTORY_SAMPLE_SIZE, side='right')
+    sizes = np.floor(rng.random(size) * (largest - smallest + 1)[categories]).astype(np.int64) + smallest[categories]
+    large = categories == len(CONSONANT_INVENTORY_SIZE_CATEGORIES)
+    tail = np.floor(rng.exponential(LARGE_CONSONANT_INVENTORY_SCALE, size) * LARGE_CONSONANT_INVENTORY_RANGE)
+    sizes[large] = tail[large].astype(np.int64) + LARGE_CONSONANT_INVENTORY_MINIMUM
+    return sizes
+
+
+# returns the consonant masks the has: constraints require and the mask of consonants the no: constraints allow
+# every has: constraint needs at least one consonant of its mask in the inventory, a single sound is a mask of one
+# raises ValueError if a has: constraint only matches consonants that no: constraints rule out
+def constrained_consonants(constraints, inventory):
+    allowed = inventory.all_consonants_mask
+    for to_be_removed in constraints.no:
+        mask = inventory.constraint_masks(to_be_removed)[0]
+        if mask is not None:
+            allowed &= ~mask
+    required = []
+    for to_be_added in constraints.has:
+        mask = inventory.constraint_masks(to_be_added)[0]
+        if mask is None:
+            continue
+        if mask == 0:
+            raise ValueError(f"constraint 'has: {to_be_added}' does not match any consonant")
+        if mask & allowed == 0:
+            raise ValueError(f"constraint 'has: {to_be_added}' only matches consonants ruled out by no: constraints")
+        required.append(mask & allowed)
+    return required, allowed
+
+
+def select_consonants(constraints=None, rng=None):
     # Follows distribution shown here: https://wals.info/chapter/1
 
-    if constraints is None:
-        constraints = []
-    working_consonants = create_all_ipa_consonants()
-    # remove restricted consonants based on constraints
-    for constraint in constraints:
-        if 'no:' in constraint:
-            # attempt to remove if it exists
-            to_be_removed = constraint.replace('no:', '').strip()
-            for consonant in working_consonants:
-                if to_be_removed == consonant.ipaChar or to_be_removed == consonant.descriptiveName:
-                    working_consonants.remove(consonant)
+    stats = instrumentation.active
+    if stats is not None:
+        start = time.perf_counter_ns()
+    constraints = languageConstraints.parse_constraints(constraints)
+    rng = seeding.python_rng(rng)
+    inventory = get_ipa_inventory()
+    required, allowed = constrained_consonants(constraints, inventory)
+    available = count_members(allowed)
 
     # Consonant inventory size selection
-    # Listen to constraint specification if it exists, if not pick at random using following method:
-    # Decide which category we fall under, then pick a random number in that range
-    # Every category other than large has a uniform distribution
-    # Large has an exponential distribution to make extremely high inventories less likely
-
-    size_specified = False
-    for c in constraints:
-        if 'consonant inventory size:' in c:
-            size_specified = True
-            count = int(c.replace('consonant inventory size:', '').strip())
-
-    if not size_specified:
-        category = math.floor(random.random() * 563)
-        if category < 89:  # Small (6 - 14)
-            count = math.floor(random.random() * 9) + 6
-        elif category < (89 + 122):  # Moderately Small (15 - 18)
-            count = math.floor(random.random() * 4) + 15
-        elif category < (89 + 122 + 201):  # Average (19 - 25)
-            count = math.floor(random.random() * 7) + 19
-        elif category < (89 + 122 + 201 + 94):  # Moderately Large (26 - 33)
-            count = math.floor(random.random() * 8) + 26
-        else:  # Large (34 - 122)
-            # uses a different distribution to skew selection towards smaller side
-            count = math.floor(np.random.exponential(scale=0.2) * 89) + 34
-        if count > len(working_consonants):
-            count = len(working_consonants)
+    # Listen to constraint specification if it exists, if not pick at random
+    count = constraints.consonant_inventory_size
+    if count is None:
+        count = min(pick_consonant_inventory_size(rng), available)
+    elif count > available:
+        raise ValueError(f'consonant inventory size {count} is larger than the {available} consonants '
+                         f'the no: constraints leave')
 
     # Pick consonants
     # Note: if there are more 'has:' constraints than 'consonant inventory size:' specifies,
     # we will include all 'has:' constraints instead of adhering to 'consonant inventory size:'
-    output = []
-    # insert any consonants specified by constraints
-    for constraint in constraints:
-        if 'has:' in constraint:
-            # check if what follows is in working_consonants
-            # note: this means no: will take priority over has: in conflicting constraints
-            to_be_added = constraint.replace('has:', '').strip()
-            for consonant in working_consonants:
-                if to_be_added == consonant.ipaChar or to_be_added == consonant.descriptiveName:
-                    output.append(consonant)
+    # a has: constraint that an earlier one already satisfied adds nothing, otherwise it adds one of its consonants,
+    # picked the same way as the rest
+    consonants = inventory.consonants
+    picks = []
+    picked = 0
+    for mask in required:
+        if mask & picked:
+            continue
+        picked = pick_tiered_consonants(get_consonant_tiers(mask), 1, picked, picks, rng)
+    pick_tiered_consonants(get_consonant_tiers(allowed), count - len(picks), picked, picks, rng)
+    output = [consonants[i] for i in picks]
+
+    if stats is not None:
+        stats.record_stage('consonant selection', start)
+    return output
 
-    # Make a list of consonants with the common tag
-    common_consonants = []
-    for s in working_consonants:
-        if s.commonness == 'common':
-            common_consonants.append(s)
-    # pick common consonants first
-    for i in range(count):
-        if len(common_consonants) > 0:
-            pick_index = math.floor(random.random() * len(common_consonants))
-            output.append(common_consonants[pick_index])
-            working_consonants.remove(common_consonants[pick_index])
-            common_consonants.pop(pick_index)
-        else:
-            pick_index = math.floor(random.random() * len(working_consonants))
-            output.append(working_consonants[pick_index])
-            working_consonants.pop(pick_index)
 
+# returns (consonant numbers, weights, heaviest weight, mask) of every commonness tier of the consonants in mask,
+# skipping empty tiers, worked out once for every mask the constraints in use give
+@lru_cache(maxsize=256)
+def get_consonant_tiers(mask):
+    inventory = get_ipa_inventory()
+    output = []
+    for tier in range(len(CONSONANT_COMMONNESS_TIERS)):
+        members = tuple(i for i in mask_members(mask) if inventory.consonant_tiers[i] == tier)
+        if members:
+            weights = tuple(inventory.consonant_weights[i] for i in members)
+            output.append((members, weights, max(weights), sum(1 << i for i in members)))
+    return tuple(output)
+
+
+# appends count consonant numbers from tiers that are not in the picked mask to picks and returns the new picked mask
+# every tier is used up before the next one is touched, and within a tier consonants are drawn one after another in
+# proportion to their weights (by rejection, which only costs a few draws per pick), the same distribution the
+# sampling keys of select_consonants_batch() give
+def pick_tiered_consonants(tiers, count, picked, picks, rng):
+    rand = rng.random
+    for members, weights, heaviest, tier_mask in tiers:
+        if count <= 0:
+            break
+        left = count_members(tier_mask & ~picked)
+        if count >= left:
+            # the whole tier is picked, no draws needed
+            for i in members:
+                if not picked >> i & 1:
+                    picks.append(i)
+            picked |= tier_mask
+            count -= left
+            continue
+        size = len(members)
+        while count > 0:
+            j = int(rand() * size)
+            i = members[j]
+            if picked >> i & 1:
+                continue
+            weight = weights[j]
+            if weight < heaviest and rand() * heaviest >= weight:
+                continue
+            picks.append(i)
+            picked |= 1 << i
+            count -= 1
+    return picked
+
+
+# returns a list of consonant lists for count languages, picked the same way as select_consonants() but with one
+# numpy draw for every language at once
+def select_consonants_batch(count, constraints=None, rng=None):
+    import numpy as np
+    constraints = languageConstraints.parse_constraints(constraints)
+    rng = seeding.numpy_rng(rng)
+    inventory = get_ipa_inventory()
+    required, allowed = constrained_consonants(constraints, inventory)
+    available = count_members(allowed)
+
+    if constraints.consonant_inventory_size is None:
+        sizes = np.minimum(sample_consonant_inventory_sizes(count, rng), available)
+    elif constraints.consonant_inventory_size > available:
+        raise ValueError(f'consonant inventory size {constraints.consonant_inventory_size} is larger than the '
+                         f'{available} consonants the no: constraints leave')
+    else:
+        sizes = np.full(count, constraints.consonant_inventory_size, dtype=np.int64)
+
+    # weighted sampling without replacement (Efraimidis and Spirakis): every consonant gets the key E / weight, where E
+    # is exponentially distributed, and the consonants with the smallest keys are picked; the tier offsets make every
+    # tier sort before the next
+    keys = rng.exponential(1.0, (count, len(inventory.consonants)))
+    keys /= inventory.consonant_weights
+    keys += np.array(inventory.consonant_tiers) * CONSONANT_TIER_KEY_OFFSET
+    # no: consonants sort last and are never reached
+    keys[:, mask_members(inventory.all_consonants_mask & ~allowed)] = np.inf
+    # the consonant every unsatisfied has: constraint adds sorts first, in constraint order
+    for k, mask in enumerate(required):
+        members = np.array(mask_members(mask))
+        member_keys = keys[:, members]
+        rows = np.flatnonzero((member_keys >= 0).all(axis=1))
+        keys[rows, members[member_keys[rows].argmin(axis=1)]] = k - len(required)
+    sizes = np.maximum(sizes, (keys < 0).sum(axis=1))
+    order = np.argsort(keys, axis=1, kind='stable')
+
+    consonants = inventory.consonants
+    output = []
+    for row, size in zip(order.tolist(), sizes.tolist()):
+        output.append([consonants[i] for i in row[:size]])
     return output
 
 
-def select_vowels(constraints=None):
-    all_vowels = create_all_ipa_vowels()
-    selected_vowels = []
-    vowel_inventory_size = None
-    if constraints is not None:
-        for c in constraints:
-            if 'vowel inventory size:' in c:
-                vowel_inventory_size = c.replace('vowel inventory size:', '').strip()
-            elif 'has:' in c:
-                to_be_added = c.replace('has:', '').strip()
-                # find matching vowel in all_vowels
-                for v in all_vowels:
-                    if v.ipaChar == to_be_added or v.descriptiveName == to_be_added:
-                        selected_vowels.append(v)
-            elif 'no:' in c:
-                to_be_removed = c.replace('no:', '').strip()
-                for v in all_vowels:
-                    if v.ipaChar == to_be_removed or v.descriptiveName == to_be_removed:
-                        all_vowels.remove(v)
-
-    if vowel_inventory_size == None:
-        if random.random() < 0.5:
+# Position of every vowel feature on a scale from 0 to 1, used to place vowels in a vowel space
+# height and backness follow the IPA vowel chart, roundedness counts for half as much as going from close to open
+VOWEL_HEIGHT_VALUES = {'close': 0, 'nearclose': 1 / 6, 'closemid': 2 / 6, 'mid': 3 / 6, 'openmid': 4 / 6,
+                       'nearopen': 5 / 6, 'open': 1}
+VOWEL_BACKNESS_VALUES = {'front': 0, 'nearfront': 1 / 4, 'central': 2 / 4, 'nearback': 3 / 4, 'back': 1}
+VOWEL_ROUNDEDNESS_VALUES = {'unrounded': 0, 'rounded': 0.5}
+
+
+# returns the (height, backness, roundedness) coordinates of a vowel
+def vowel_features(vowel):
+    return (VOWEL_HEIGHT_VALUES[vowel.height], VOWEL_BACKNESS_VALUES[vowel.backness],
+            VOWEL_ROUNDEDNESS_VALUES[vowel.roundedness])
+
+
+# returns the read-only matrix of euclidean distances between the feature coordinates of every pair of inventory
+# vowels, indexed by vowel number (a vowel's inventory code minus the number of consonants)
+@lru_cache(maxsize=None)
+def get_vowel_distances():
+    import numpy as np
+    features = np.array([vowel_features(v) for v in get_ipa_inventory().vowels])
+    distances = np.sqrt(((features[:, np.newaxis, :] - features[np.newaxis, :, :]) ** 2).sum(axis=2))
+    distances.flags.writeable = False
+    return distances
+
+
+def vowel_number(vowel):
+    inventory = get_ipa_inventory()
+    return inventory.code_by_char[vowel.ipaChar] - len(inventory.consonants)
+
+
+# returns the vowel masks the has: constraints require and the mask of vowels the no: constraints allow, like
+# constrained_consonants()
+def constrained_vowels(constraints, inventory):
+    allowed = inventory.all_vowels_mask
+    for to_be_removed in constraints.no:
+        mask = inventory.constraint_masks(to_be_removed)[1]
+        if mask is not None:
+            allowed &= ~mask
+    # a language needs vowels to build syllables from
+    if allowed == 0:
+        raise ValueError('the no: constraints rule out every vowel')
+    required = []
+    for to_be_added in constraints.has:
+        mask = inventory.constraint_masks(to_be_added)[1]
+        if mask is None:
+            continue
+        if mask == 0:
+            raise ValueError(f"constraint 'has: {to_be_added}' does not match any vowel")
+        if mask & allowed == 0:
+            raise ValueError(f"constraint 'has: {to_be_added}' only matches vowels ruled out by no: constraints")
+        required.append(mask & allowed)
+    return required, allowed
+
+
+# returns the vowel numbers of the preset vowel system for this size, or None if there is none or it uses a vowel
+# that is not allowed
+def preset_vowel_system(size, excluded):
+    if size == 3:
+        system = THREE_VOWEL_SYSTEM
+    elif size == 5:
+        system = FIVE_VOWEL_SYSTEM
+    else:
+        return None
+    vowel_by_char = get_ipa_inventory().vowel_by_char
+    numbers = [vowel_number(vowel_by_char[c]) for c in system]
+    if set(excluded).intersection(numbers):
+        return None
+    return numbers
+
+
+def select_vowels(constraints=None, rng=None):
+    stats = instrumentation.active
+    if stats is not None:
+        start = time.perf_counter_ns()
+    constraints = languageConstraints.parse_constraints(constraints)
+    rng = seeding.python_rng(rng)
+    inventory = get_ipa_inventory()
+    required, allowed = constrained_vowels(constraints, inventory)
+    available = count_members(allowed)
+    excluded = mask_members(inventory.all_vowels_mask & ~allowed)
+
+    vowel_inventory_size = constraints.vowel_inventory_size
+    if vowel_inventory_size is None:
+        if rng.random() < 0.5:
             vowel_inventory_size = 3
         else:
             vowel_inventory_size = 5
+        vowel_inventory_size = min(vowel_inventory_size, available)
+    elif vowel_inventory_size > available:
+        raise ValueError(f'vowel inventory size {vowel_inventory_size} is larger than the {available} vowels '
+                         f'the no: constraints leave')
+
+    selected = None
+    if len(required) == 0:
+        selected = preset_vowel_system(vowel_inventory_size, excluded)
+    if selected is None:
+        selected = []
+        picked = 0
+        for mask in required:
+            if mask & picked:
+                continue
+            members = mask_members(mask)
+            if len(selected) == 0:
+                selected.append(members[math.floor(rng.random() * len(members))])
+            else:
+                # add the vowel of the class farthest from the vowels already picked
+                others = mask_members(inventory.all_vowels_mask & ~mask)
+                selected = farthest_vowels(selected, others, len(selected) + 1)
+            picked |= 1 << selected[-1]
+        if len(selected) == 0 and vowel_inventory_size > 0:
+            # start from a random vowel that is allowed
+            allowed_vowels = mask_members(allowed)
+            selected.append(allowed_vowels[math.floor(rng.random() * len(allowed_vowels))])
+        selected = farthest_vowels(selected, excluded, vowel_inventory_size)
+    selected_vowels = [inventory.vowels[i] for i in selected]
+
+    if stats is not None:
+        stats.record_stage('vowel selection', start)
+    return selected_vowels
+
+
+# returns the vowel numbers of selected followed by the vowels farthest from them until there are size of them
+# every added vowel is the allowed vowel whose distance to the closest vowel already picked is largest, and ties go
+# to the vowel with the lowest number
+def farthest_vowels(selected, excluded, size):
+    import numpy as np
+    distances = get_vowel_distances()
+    output = list(selected)
+    if len(output) >= size:
+        return output
+    # closest distance from every vowel to the vowels picked so far, with vowels that cannot be picked at -1
+    closest = distances[output].min(axis=0)
+    closest[output] = -1
+    closest[excluded] = -1
+    while len(output) < size:
+        furthest = int(closest.argmax())
+        output.append(furthest)
+        np.minimum(closest, distances[furthest], out=closest)
+        closest[furthest] = -1
+    return output
 
-    if len(selected_vowels) == 0 and vowel_inventory_size == 3:
-        return create_3_vowel_system()
-    elif len(selected_vowels) == 0 and vowel_inventory_size == 5:
-        return create_5_vowel_system()
-
-    while len(selected_vowels) < vowel_inventory_size:
-        # select a vowel that is as far away from the others as possible
-        selected_vowels.append(select_furthest_vowel(selected_vowels, all_vowels))
 
+# returns the vowel in all_vowels farthest from the vowels in selected_vowels, or None if all_vowels has no vowel
+# that is not selected yet
 def select_furthest_vowel(selected_vowels, all_vowels):
-    distances = {}
-    for av in all_vowels:
-        current_vowel_distance = 0
-        is_duplicate = False
-        for sv in selected_vowels:
-            if av == sv:
-                is_duplicate = True
-                break
-            else:
-                current_vowel_distance += distance_between_vowels(av, sv)
-        if not is_duplicate:
-            distances[av] = current_vowel_distance
-
-    # pick furthest vowel
-    furthest_distance = 0
-    furthest_vowel = None
-    for d in distances:
-        if distances[d] > furthest_distance:
-            furthest_distance = distances[d]
-            furthest_vowel = d
+    candidates = set(vowel_number(v) for v in all_vowels) - set(vowel_number(v) for v in selected_vowels)
+    if len(candidates) == 0:
+        return None
+    if len(selected_vowels) == 0:
+        return get_ipa_inventory().vowels[min(candidates)]
+    excluded = sorted(set(range(len(get_ipa_inventory().vowels))) - candidates)
+    selected = [vowel_number(v) for v in selected_vowels]
+    return get_ipa_inventory().vowels[farthest_vowels(selected, excluded, len(selected) + 1)[-1]]
 
-    return furthest_vowel
 
+# returns the distance between two vowels in the vowel space
 def distance_between_vowels(v1, v2):
-    v1_height_value = None
-    v1_backness_value = None
+    return float(get_vowel_distances()[vowel_number(v1), vowel_number(v2)])
+
+
+# returns a list of vowel lists for count languages, picked the same way as select_vowels() but with numpy arrays
+# covering every language at once
+def select_vowels_batch(count, constraints=None, rng=None):
+    import numpy as np
+    constraints = languageConstraints.parse_constraints(constraints)
+    rng = seeding.numpy_rng(rng)
+    inventory = get_ipa_inventory()
+    required, allowed = constrained_vowels(constraints, inventory)
+    available = count_members(allowed)
+    excluded = mask_members(inventory.all_vowels_mask & ~allowed)
+    distances = get_vowel_distances()
+
+    if constraints.vowel_inventory_size is None:
+        sizes = np.minimum(np.where(rng.random(count) < 0.5, 3, 5), available)
+    elif constraints.vowel_inventory_size > available:
+        raise ValueError(f'vowel inventory size {constraints.vowel_inventory_size} is larger than the {available} '
+                         f'vowels the no: constraints leave')
+    else:
+        sizes = np.full(count, constraints.vowel_inventory_size, dtype=np.int64)
+
+    # picked[row, k] is the k-th vowel number of language row and counts[row] how many it has so far
+    # closest[row, v] is the distance from vowel v to the closest vowel picked, or -1 if v cannot be picked
+    largest = int(sizes.max()) if count > 0 else 0
+    picked = np.zeros((count, largest + len(required)), dtype=np.int64)
+    counts = np.zeros(count, dtype=np.int64)
+    is_picked = np.zeros((count, len(inventory.vowels)), dtype=bool)
+    closest = np.full((count, len(inventory.vowels)), np.inf)
+    closest[:, excluded] = -1
+
+    def add(rows, vowels):
+        picked[rows, counts[rows]] = vowels
+        counts[rows] += 1
+        is_picked[rows, vowels] = True
+        closest[rows] = np.minimum(closest[rows], distances[vowels])
+        closest[rows, vowels] = -1
+
+    def add_random(rows, members):
+        add(rows, members[rng.integers(0, len(members), len(rows))])
+
+    for mask in required:
+        members = np.array(mask_members(mask))
+        rows = np.flatnonzero(~is_picked[:, members].any(axis=1))
+        starting = rows[counts[rows] == 0]
+        if len(starting) > 0:
+            add_random(starting, members)
+        rows = rows[counts[rows] > 0]
+        rows = rows[~is_picked[rows][:, members].any(axis=1)]
+        if len(rows) > 0:
+            add(rows, members[closest[rows][:, members].argmax(axis=1)])
+    if len(required) == 0 and count > 0:
+        add_random(np.arange(count), np.array(mask_members(allowed)))
+    sizes = np.maximum(sizes, counts)
+    while True:
+        rows = np.flatnonzero(counts < sizes)
+        if len(rows) == 0:
+            break
+        add(rows, closest[rows].argmax(axis=1))
 
+    output = []
+    for row, size, n in zip(picked.tolist(), sizes.tolist(), counts.tolist()):
+        system = None
+        if len(required) == 0:
+            system = preset_vowel_system(size, excluded)
+        if system is None:
+            system = row[:n]
+        output.append([inventory.vowels[i] for i in system])
+    return output
 
-def generate_phonology(constraints=None):
-    if constraints is None:
-        constraints = []
-    selected_consonants = select_consonants(constraints)
-    selected_vowels = select_vowels(constraints)
+
+def generate_phonology(constraints=None, rng=None):
+    constraints = languageConstraints.parse_constraints(constraints)
+    selected_consonants = select_consonants(constraints, rng)
+    selected_vowels = select_vowels(constraints, rng)
     return selected_consonants, selected_vowels
 
 
@@ -474,195 +960,188 @@ def display_phonology(phonology):
     display_vowels(vowels)
 
 
-def display_pulmonic_consonants(consonants):
-    pulmonic_consonants = [
-        ['', 'Bilabial', 'Labio-dental', 'Linguo-labial', 'Dental', 'Alveolar', 'Post-alveolar', 'Retro-flex',
-         'Palatal', 'Velar', 'Uvular', 'Pharyngeal/epiglottal', 'Glottal'],
-        ['Nasal', ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''],
-         ['', ''], ['', '']],
-        ['Plosive', ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''],
-         ['', ''], ['', '']],
-        ['Sibilant fricative', ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''],
-         ['', ''], ['', ''], ['', '']],
-        ['Non-sibilant fricative', ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''],
-         ['', ''], ['', ''], ['', ''], ['', '']],
-        ['Approximant', ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''],
-         ['', ''], ['', ''], ['', '']],
-        ['Tap/flap', ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''],
-         ['', ''], ['', '']],
-        ['Trill', ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''],
-         ['', ''], ['', '']],
-        ['Lateral fricative', ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''],
-         ['', ''], ['', ''], ['', '']],
-        ['Lateral approximant', ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''],
-         ['', ''], ['', ''], ['', ''], ['', '']],
-        ['Lateral tap/flap', ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''], ['', ''],
-         ['', ''], ['', ''], ['', '']]]
-
-    pulmonic_place_dict = {
-        'bilabial': 'Bilabial',
-        'labiodental': 'Labio-dental',
-        'linguolabial': 'Linguo-labial',
-        'dental': 'Dental',
-        'alveolar': 'Alveolar',
-        'postalveolar': 'Post-alveolar',
-        'retroflex': 'Retro-flex',
-        'palatal': 'Palatal',
-        'velar': 'Velar',
-        'uvular': 'Uvular',
-        'pharyngeal': 'Pharyngeal/epiglottal',
-        'glottal': 'Glottal'
-    }
-
-    pulmonic_manner_dict = {
-        'nasal': 'Nasal',
-        'plosive': 'Plosive',
-        'sibilant': 'Sibilant fricative',
-        'fricative': 'Non-sibilant fricative',
-        'approximant': 'Approximant',
-        'flap': 'Tap/flap',
-        'trill': 'Trill',
-        'lateralfricative': 'Lateral fricative',
-        'lateralapproximant': 'Lateral approximant',
-        'lateralflap': 'Lateral tap/flap'
-    }
-
-    row_headers = []
-    for r in pulmonic_consonants:
-        row_headers.append(r[0])
-
+# The layout of the consonant charts, following the IPA chart
+# every row and column is (feature, header) and a consonant goes in the row of its manner and the column of its place
+PULMONIC_CHART_ROWS = (
+    ('nasal', 'Nasal'), ('plosive', 'Plosive'), ('sibilant', 'Sibilant fricative'),
+    ('fricative', 'Non-sibilant fricative'), ('approximant', 'Approximant'), ('flap', 'Tap/flap'), ('trill', 'Trill'),
+    ('lateralfricative', 'Lateral fricative'), ('lateralapproximant', 'Lateral approximant'),
+    ('lateralflap', 'Lateral tap/flap'))
+PULMONIC_CHART_COLUMNS = (
+    ('bilabial', 'Bilabial'), ('labiodental', 'Labio-dental'), ('linguolabial', 'Linguo-labial'), ('dental', 'Dental'),
+    ('alveolar', 'Alveolar'), ('postalveolar', 'Post-alveolar'), ('retroflex', 'Retro-flex'), ('palatal', 'Palatal'),
+    ('velar', 'Velar'), ('uvular', 'Uvular'), ('pharyngeal', 'Pharyngeal/epiglottal'), ('glottal', 'Glottal'))
+# non-pulmonic rows have two headers, the kind of consonant and the row within that kind
+NONPULMONIC_CHART_ROWS = (
+    ('Ejective', 'Stop'), ('Ejective', 'Fricative'), ('Ejective', 'Lateral fricative'), ('Click', 'Tenuis'),
+    ('Click', 'Voiced'), ('Click', 'Nasal'), ('Click', 'Tenuis lateral'), ('Click', 'Voiced lateral'),
+    ('Click', 'Nasal lateral'), ('Implosive', 'Voiced'), ('Implosive', 'Voiceless'))
+NONPULMONIC_CHART_COLUMNS = (
+    ('bilabial', 'Bilabial'), ('labiodental', 'Labio-dental'), ('dental', 'Dental'), ('alveolar', 'Alveolar'),
+    ('postalveolar', 'Post-alveolar'), ('retroflex', 'Retro-flex'), ('palatal', 'Palatal'), ('velar', 'Velar'),
+    ('uvular', 'Uvular'), ('pharyngeal', 'Pharyngeal/epiglottal'))
+PULMONIC_CHART = 0
+NONPULMONIC_CHART = 1
+
+
+# returns where consonant goes in the consonant charts as (chart, row, column, slot), or None if it is in neither
+# slot is 0 for voiceless and 1 for voiced pulmonic consonants, which share a cell, and always 0 for non-pulmonic ones
+# raises ValueError for a consonant whose features do not fit its chart
+def consonant_chart_position(consonant):
+    c = consonant
+    if c.sound_type == 'pulmonic':
+        rows = [feature for feature, header in PULMONIC_CHART_ROWS]
+        columns = [feature for feature, header in PULMONIC_CHART_COLUMNS]
+        if c.manner[0] not in rows or c.place[0] not in columns:
+            raise ValueError(f'cannot find the chart cell of {c.ipaChar}')
+        if c.phonation == 'voiceless':
+            slot = 0
+        elif c.phonation == 'voiced':
+            slot = 1
+        else:
+            raise ValueError(f'{c.descriptiveName} has a phonation that is not set correctly')
+        return PULMONIC_CHART, rows.index(c.manner[0]), columns.index(c.place[0]), slot
+
+    if c.sound_type != 'nonpulmonic':
+        return None
+
+    # find row
+    row = None
+    if 'ejective' in c.manner:
+        if 'plosive' in c.manner:
+            row = 0
+        # this is out of order because fricative is in lateralfricative
+        elif 'lateralfricative' in c.manner:
+            row = 2
+        elif 'fricative' in c.manner:
+            row = 1
+    # this is also out of order for a similar reason as above
+    elif 'lateralclick' in c.manner:
+        if c.phonation == 'voiceless':
+            row = 6
+        elif c.phonation == 'voiced':
+            row = 8 if 'nasal' in c.manner else 7
+    elif 'click' in c.manner:
+        if c.phonation == 'voiceless':
+            row = 3
+        elif c.phonation == 'voiced':
+            row = 5 if 'nasal' in c.manner else 4
+    elif 'implosive' in c.manner:
+        if c.phonation == 'voiced':
+            row = 9
+        elif c.phonation == 'voiceless':
+            row = 10
+    if row is None:
+        raise ValueError(f'cannot find the chart row of {c.ipaChar}')
+
+    # find column
+    columns = [feature for feature, header in NONPULMONIC_CHART_COLUMNS]
+    place = None
+    if 'lateralclick' in c.manner:
+        place = 'alveolar'
+    elif 'click' in c.manner:
+        # clicks are also velar, so they go in the column of their other place
+        for p in c.place:
+            if p != 'velar':
+                place = p
+    else:
+        place = c.place[0]
+    if place not in columns:
+        raise ValueError(f'cannot find the chart column of {c.ipaChar}')
+    return NONPULMONIC_CHART, row, columns.index(place), 0
+
+
+# returns the chart position of every inventory consonant, indexed by inventory code, worked out once per process
+@lru_cache(maxsize=None)
+def get_consonant_chart_positions():
+    return tuple(consonant_chart_position(c) for c in get_ipa_inventory().consonants)
+
+
+# The cells of one consonant chart that a phonology fills, with only the rows and columns that have a consonant
+# header() and rows() give the chart row by row, with the row headers first in every row
+class ConsonantChart:
+    def __init__(self, row_headers, column_headers, header_columns, paired):
+        # row_headers[row] is the tuple of header cells of a row
+        self.row_headers = row_headers
+        self.column_headers = column_headers
+        self.header_columns = header_columns
+        # whether cells hold a voiceless and voiced pair, as in the pulmonic chart
+        self.paired = paired
+        # (row, column) -> list of the consonants in each slot of the cell
+        self.cells = {}
+
+    def __len__(self):
+        return len(self.cells)
+
+    def add(self, row, column, slot, consonant):
+        cell = self.cells.get((row, column))
+        if cell is None:
+            cell = self.cells[(row, column)] = ['', '']
+        cell[slot] = consonant.ipaChar
+
+    def used_rows(self):
+        return sorted(set(row for row, column in self.cells))
+
+    def used_columns(self):
+        return sorted(set(column for row, column in self.cells))
+
+    # returns the text of a cell, voiceless and voiced pulmonic consonants are shown as a pair
+    def cell_text(self, row, column):
+        cell = self.cells.get((row, column))
+        if cell is None:
+            return ''
+        if not self.paired:
+            return cell[0]
+        if cell[1] == '':
+            return '   ' + cell[0]
+        if cell[0] == '':
+            return '   ' + cell[1]
+        return cell[0] + '  ' + cell[1]
+
+    def header(self):
+        return [''] * self.header_columns + [self.column_headers[j] for j in self.used_columns()]
+
+    # yields every row that has a consonant as a list of cells
+    def rows(self):
+        columns = self.used_columns()
+        for i in self.used_rows():
+            yield list(self.row_headers[i]) + [self.cell_text(i, j) for j in columns]
+
+
+# returns the pulmonic and non-pulmonic ConsonantCharts of consonants
+def consonant_charts(consonants):
+    charts = (ConsonantChart([(header,) for feature, header in PULMONIC_CHART_ROWS],
+                             [header for feature, header in PULMONIC_CHART_COLUMNS], 1, True),
+              ConsonantChart(NONPULMONIC_CHART_ROWS, [header for feature, header in NONPULMONIC_CHART_COLUMNS], 2,
+                             False))
+    positions = get_consonant_chart_positions()
+    code_by_char = get_ipa_inventory().code_by_char
     for c in consonants:
-        if c.sound_type == 'pulmonic':
-            column = pulmonic_consonants[0].index(pulmonic_place_dict[c.place[0]])
-            row = row_headers.index(pulmonic_manner_dict[c.manner[0]])
-            if c.phonation == 'voiceless':
-                pulmonic_consonants[row][column][0] = c.ipaChar
-            elif c.phonation == 'voiced':
-                pulmonic_consonants[row][column][1] = c.ipaChar
-            else:
-                print(f'{c.descriptiveName} has a phonation that is not set correctly')
+        code = code_by_char.get(c.ipaChar)
+        position = positions[code] if code is not None else consonant_chart_position(c)
+        if position is not None:
+            chart, row, column, slot = position
+            charts[chart].add(row, column, slot, c)
+    return charts
 
-    format_pairs_in_table(pulmonic_consonants)
-    pulmonic_consonants = trim_table(pulmonic_consonants)
 
-    if len(pulmonic_consonants) > 1:
+def display_pulmonic_consonants(consonants):
+    from tabulate import tabulate
+    chart = consonant_charts(consonants)[PULMONIC_CHART]
+    if len(chart) > 0:
         print('Pulmonic Consonants')
         print('In places where letters appear in pairs, the letter to the right represents a voiced consonant')
         print('and the letter to the left represents an unvoiced consonant')
         print('In places where letters appear by themselves, the letter represents a voiced consonant')
-        print(tabulate(pulmonic_consonants, tablefmt='simple_grid'))
+        print(tabulate([chart.header()] + list(chart.rows()), tablefmt='simple_grid'))
 
 
 def display_nonpulmonic_consonants(consonants):
-    output = [
-        ['', '', 'Bilabial', 'Labio-dental', 'Dental', 'Alveolar', 'Post-alveolar', 'Retro-flex', 'Palatal', 'Velar',
-         'Uvular', 'Pharyngeal/epiglottal'],
-        ['Ejective', 'Stop'],
-        ['Ejective', 'Fricative'],
-        ['Ejective', 'Lateral fricative'],
-        ['Click', 'Tenuis'],
-        ['Click', 'Voiced'],
-        ['Click', 'Nasal'],
-        ['Click', 'Tenuis lateral'],
-        ['Click', 'Voiced lateral'],
-        ['Click', 'Nasal lateral'],
-        ['Implosive', 'Voiced'],
-        ['Implosive', 'Voiceless']]
-
-    column_count = len(output[0])
-    for i, r in enumerate(output):
-        while len(r) < column_count:
-            output[i].append('')
-
-    place_dict = {
-        'bilabial': 'Bilabial',
-        'labiodental': 'Labio-dental',
-        'linguolabial': 'Linguo-labial',
-        'dental': 'Dental',
-        'alveolar': 'Alveolar',
-        'postalveolar': 'Post-alveolar',
-        'retroflex': 'Retro-flex',
-        'palatal': 'Palatal',
-        'velar': 'Velar',
-        'uvular': 'Uvular',
-        'pharyngeal': 'Pharyngeal/epiglottal',
-        'glottal': 'Glottal'
-    }
-
-    for c in consonants:
-        if c.sound_type == 'nonpulmonic':
-            # find row
-            if 'ejective' in c.manner:
-                if 'plosive' in c.manner:
-                    row = 1
-                # this is out of order because fricative is in lateralfricative
-                elif 'lateralfricative' in c.manner:
-                    row = 3
-                elif 'fricative' in c.manner:
-                    row = 2
-                else:
-                    print(f'error finding row for {c.ipaChar}')
-                    exit()
-            # this is also out of order for a similar reason as above
-            elif 'lateralclick' in c.manner:
-                if c.phonation == 'voiceless':
-                    row = 7
-                elif c.phonation == 'voiced' and 'nasal' in c.manner:
-                    row = 9
-                elif c.phonation == 'voiced' and 'nasal' not in c.manner:
-                    row = 8
-                else:
-                    print(f'error finding row for {c.ipaChar}')
-                    exit()
-            elif 'click' in c.manner:
-                if c.phonation == 'voiceless':
-                    row = 4
-                elif c.phonation == 'voiced' and 'nasal' in c.manner:
-                    row = 6
-                elif c.phonation == 'voiced' and 'nasal' not in c.manner:
-                    row = 5
-                else:
-                    print(f'error finding row for {c.ipaChar}')
-                    exit()
-            elif 'implosive' in c.manner:
-                if c.phonation == 'voiced':
-                    row = 10
-                elif c.phonation == 'voiceless':
-                    row = 11
-                else:
-                    print(f'error finding row for {c.ipaChar}')
-                    exit()
-            else:
-                print(f'error finding row for {c.ipaChar}')
-                exit()
-
-            # find column
-            if 'lateralclick' in c.manner:
-                column = 5
-            elif 'click' in c.manner:
-                for p in c.place:
-                    if not p == 'velar':
-                        if p == 'bilabial':
-                            column = 2
-                        elif p == 'dental':
-                            column = 4
-                        elif p == 'alveolar':
-                            column = 5
-                        elif p == 'palatal':
-                            column = 8
-            elif 'ejective' in c.manner or 'implosive' in c.manner:
-                column = output[0].index(place_dict[c.place[0]])
-            else:
-                print(f'error finding column for {c.ipaChar}')
-                exit()
-
-            output[row][column] = c.ipaChar
-
-    output = trim_table(output, header_columns=2)
-
-    if len(output) > 1:
+    from tabulate import tabulate
+    chart = consonant_charts(consonants)[NONPULMONIC_CHART]
+    if len(chart) > 0:
         print('Non-pulmonic Consonants')
-        print(tabulate(output, tablefmt='simple_grid'))
+        print(tabulate([chart.header()] + list(chart.rows()), tablefmt='simple_grid'))
 
 
 def display_vowels(vowels):
@@ -671,57 +1150,6 @@ def display_vowels(vowels):
         print(str(v))
 
 
-def format_pairs_in_table(table):
-    for i, r in enumerate(table):
-        for j, e in enumerate(r):
-            if e == ['', '']:
-                table[i][j] = ''
-            elif type(e) is list and e[0] == '':
-                table[i][j] = '   ' + e[1]
-            elif type(e) is list and e[1] == '':
-                table[i][j] = '   ' + e[0]
-            elif type(e) is list:
-                table[i][j] = e[0] + '  ' + e[1]
-    return table
-
-def trim_table(table, header_rows=1, header_columns=1):
-    output = trim_rows(table, header_columns)
-    output = trim_columns(output, header_rows)
-    return output
-
-
-def trim_rows(table, header_columns):
-    empty_row_indices = []
-    for r in table:
-        is_empty = True
-        for e in r:
-            if e != '' and r.index(e) >= header_columns:
-                is_empty = False
-        if is_empty:
-            empty_row_indices.append(table.index(r))
-
-    for i in reversed(empty_row_indices):
-        table.remove(table[i])
-
-    return table
-
-
-def trim_columns(table, header_rows):
-    empty_column_indices = []
-    for i in range(len(table[0])):
-        is_empty = True
-        for r in table:
-            if r[i] != '' and table.index(r) >= header_rows:
-                is_empty = False
-        if is_empty:
-            empty_column_indices.append(i)
-
-    for i in reversed(empty_column_indices):
-        for j, r in enumerate(table):
-            table[j].pop(i)
-
-    return table
-
 def printPhonology(phonology):
     selectedConsonants = phonology[0]
     selectedVowels = phonology[1]
@@ -0,0 +1,128 @@
+# This script rebuilds a language from changed constraints, redoing only the stages the change affects
+#
+# usage:
+#     pipeline = LanguagePipeline(seed)
+#     first = pipeline.build(['max syllables in morpheme: 3'])
+#     second = pipeline.build(['max syllables in morpheme: 4'])    # reuses the consonants and vowels of first
+#
+# A language is built in stages that form a small dependency graph:
+#     consonants ─┐
+#                 ├─ morphology
+#     vowels ─────┘
+# The IPA inventory the stages read is not a stage of its own, phonologyGen.get_ipa_inventory() already loads it
+# once per process.
+# Every stage declares which constraint fields it reads, and its output is memoized under the values of just those
+# fields plus the keys of the stages it depends on. Changing a constraint only reruns the stages that read it and the
+# stages after them, e.g. a new max syllables reruns morphology but keeps the phonology.
+# has: and no: constraints are split by what they name, so a vowel constraint does not rerun the consonants.
+# Each stage draws from the same seeding.stage_rng() generator as language.generate_language(), so a pipeline
+# builds exactly the language generate_language() would for the same seed and constraints.
+
+from collections import OrderedDict
+import language
+import languageConstraints
+import morphologyGen
+import phonologyGen
+import seeding
+
+# how many outputs every stage keeps, the most recently used ones are kept
+DEFAULT_CACHE_SIZE = 16
+
+
+# One stage of building a language
+# fields are the Constraints fields the stage reads and dependencies the names of the stages whose outputs it takes
+# run(seed, constraints, inputs) returns the stage's output, inputs maps every dependency to its output
+class Stage:
+    def __init__(self, name, fields, dependencies, run):
+        self.name = name
+        self.fields = fields
+        self.dependencies = dependencies
+        self.run = run
+
+    # returns the values of the constraints this stage reads
+    def constraint_key(self, constraints):
+        values = []
+        for field in self.fields:
+            value = getattr(constraints, field)
+            if field == 'has' or field == 'no':
+                value = self.sound_constraints(value)
+            values.append(value)
+        return tuple(values)
+
+    # returns the has: or no: entries this stage's sounds can match
+    def sound_constraints(self, entries):
+        inventory = phonologyGen.get_ipa_inventory()
+        if self.name == 'consonants':
+            return tuple(e for e in entries if inventory.consonant_mask(e) is not None)
+        if self.name == 'vowels':
+            return tuple(e for e in entries if inventory.vowel_mask(e) is not None)
+        return entries
+
+
+def run_consonants(seed, constraints, inputs):
+    return phonologyGen.select_consonants(constraints, seeding.stage_rng(seed, 'consonants'))
+
+
+def run_vowels(seed, constraints, inputs):
+    return phonologyGen.select_vowels(constraints, seeding.stage_rng(seed, 'vowels'))
+
+
+def morphology_stage(morpheme_count):
+    def run_morphology(seed, constraints, inputs):
+        phonology = (inputs['consonants'], inputs['vowels'])
+        return morphologyGen.generate_morphology(phonology, constraints, morpheme_count,
+                                                 seeding.stage_rng(seed, 'morphology'))
+    return run_morphology
+
+
+# returns the stages of building a language, every stage after the stages it depends on
+def language_stages(morpheme_count):
+    return (
+        Stage('consonants', ('has', 'no', 'consonant_inventory_size'), (), run_consonants),
+        Stage('vowels', ('has', 'no', 'vowel_inventory_size'), (), run_vowels),
+        Stage('morphology', ('starting_consonant_cluster_sizes', 'vowel_cluster_sizes',
+                             'ending_consonant_cluster_sizes', 'max_syllables', 'contrasting_vowel_length',
+                             'contrasting_consonant_length'), ('consonants', 'vowels'),
+              morphology_stage(morpheme_count))
+    )
+
+
+class LanguagePipeline:
+    def __init__(self, seed, morpheme_count=30, cache_size=DEFAULT_CACHE_SIZE):
+        self.seed = seed
+        self.morpheme_count = morpheme_count
+        self.cache_size = cache_size
+        self.stages = language_stages(morpheme_count)
+        # stage name -> OrderedDict of stage key -> output, oldest first
+        self.outputs = {stage.name: OrderedDict() for stage in self.stages}
+        # stage name -> how many times the stage has run, to see what a change reran
+        self.runs = {stage.name: 0 for stage in self.stages}
+
+    # returns the outputs of every stage for constraints, running only the stages whose key has no stored output
+    def build_stages(self, constraints=None):
+        constraints = languageConstraints.parse_constraints(constraints)
+        keys = {}
+        outputs = {}
+        for stage in self.stages:
+            # a stage's key covers the keys of the stages it depends on, so a rerun upstream reruns it too
+            key = (stage.constraint_key(constraints),) + tuple(keys[d] for d in stage.dependencies)
+            keys[stage.name] = key
+            stored = self.outputs[stage.name]
+            if key in stored:
+                stored.move_to_end(key)
+            else:
+                inputs = {d: outputs[d] for d in stage.dependencies}
+                stored[key] = stage.run(self.seed, constraints, inputs)
+                self.runs[stage.name] += 1
+                if len(stored) > self.cache_size:
+                    stored.popitem(last=False)
+            outputs[stage.name] = stored[key]
+        return outputs
+
+    # returns the language.Language for constraints, the same one language.generate_language() would make
+    def build(self, constraints=None):
+        constraints = languageConstraints.parse_constraints(constraints)
+        outputs = self.build_stages(constraints)
+        # the stored lists are shared between builds, so every language gets its own copies
+        phonology = (list(outputs['consonants']), list(outputs['vowels']))
+        return language.Language(self.seed, constraints, phonology, list(outputs['morphology']))
@@ -0,0 +1,43 @@
+# Helpers for the rng argument every generation function takes
+
+# The generators draw from an explicit random number generator instead of the module-level random and np.random
+# singletons, so a language can be rebuilt from its seed.
+# Functions that draw one value at a time take a random.Random; passing None falls back to the random module itself,
+# which keeps the old behaviour of drawing from the global state.
+# Functions that draw whole numpy arrays at once take a numpy.random.Generator; passing a random.Random derives one
+# from it, and passing None falls back to the np.random module.
+
+import random
+
+
+# returns the object scalar draws should be made from
+def python_rng(rng=None):
+    if rng is None:
+        return random
+    return rng
+
+
+# returns the object numpy array draws should be made from
+def numpy_rng(rng=None):
+    import numpy as np
+    if rng is None:
+        return np.random
+    if rng is random or isinstance(rng, random.Random):
+        # take 64 bits from the python generator so the numpy draws still follow from its seed
+        return np.random.default_rng(rng.getrandbits(64))
+    return rng
+
+
+# returns a random.Random for one stage of generating a language from seed
+# every stage gets its own generator so the stages do not shift each other's draws, e.g. changing how many
+# consonants get picked does not change the vowels
+# string seeds are hashed with sha512 by random.Random, so this is the same on every platform and every run
+def stage_rng(seed, stage):
+    return random.Random(f'{seed}:{stage}')
+
+
+# returns a random.Random for the word of one meaning in the language made from seed
+# the meaning comes last so no two (morpheme type, meaning, salt) combinations share a seed string
+# a different salt gives an unrelated generator, for when the first word for a meaning is already taken
+def word_rng(seed, morpheme_type, meaning, salt=0):
+    return random.Random(f'{seed}:word:{salt}:{morpheme_type}:{meaning}')
@@ -0,0 +1,102 @@
+# This script finds pronunciations that are within a few edits of each other without comparing every pair
+
+# Morphemes that differ in a single phoneme are easy to confuse, so a lexicon can require every two morphemes to be
+# at least some edit distance apart (see morphologyGen.generate_lexicon()). Checking a new morpheme against every
+# earlier one would make a lexicon of n morphemes take O(n²) comparisons.
+# EditDistanceIndex uses deletion neighborhoods instead: two pronunciations are within edit distance k of each other
+# only if deleting at most k phonemes from each gives the same sequence, since a substitution is one deletion from
+# each and an insertion is a deletion from the other. Every stored pronunciation is filed under each sequence its
+# deletions can make, so a new pronunciation only has to be compared with the ones filed under its own deletions.
+# With phonemes stored as bytes of inventory codes, a pronunciation of length m files about m^k entries, so building
+# a lexicon takes time roughly linear in its size for the small k that matter.
+
+from itertools import combinations
+
+
+class EditDistanceIndex:
+    def __init__(self, max_distance=1):
+        if max_distance < 0:
+            raise ValueError('max_distance must be at least 0')
+        self.max_distance = max_distance
+        # deletion variant -> pronunciations filed under it
+        self.variants = {}
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    # stores a pronunciation, given as bytes of phoneme codes
+    def add(self, codes):
+        codes = bytes(codes)
+        for variant in deletion_neighborhood(codes, self.max_distance):
+            filed = self.variants.get(variant)
+            if filed is None:
+                self.variants[variant] = [codes]
+            else:
+                filed.append(codes)
+        self.count += 1
+
+    # returns a stored pronunciation within max_distance edits of codes, or None if there is none
+    def find_within(self, codes):
+        codes = bytes(codes)
+        checked = set()
+        for variant in deletion_neighborhood(codes, self.max_distance):
+            for candidate in self.variants.get(variant, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                if edit_distance(codes, candidate, self.max_distance) <= self.max_distance:
+                    return candidate
+        return None
+
+    def __contains__(self, codes):
+        return self.find_within(codes) is not None
+
+    # stores codes and returns True if no stored pronunciation is within max_distance edits of it, otherwise
+    # returns False without storing it
+    def add_if_distinct(self, codes):
+        if self.find_within(codes) is not None:
+            return False
+        self.add(codes)
+        return True
+
+
+# returns every sequence made by deleting at most max_deletions items from codes, codes itself included
+def deletion_neighborhood(codes, max_deletions):
+    output = {codes}
+    for deletions in range(1, min(max_deletions, len(codes)) + 1):
+        for positions in combinations(range(len(codes)), deletions):
+            variant = bytearray(codes)
+            for p in reversed(positions):
+                del variant[p]
+            output.add(bytes(variant))
+    return output
+
+
+# returns the Levenshtein distance between two sequences
+# with a limit, only the band of the table within limit of the diagonal is filled and any distance over the limit
+# is returned as limit + 1
+def edit_distance(a, b, limit=None):
+    if limit is None:
+        limit = max(len(a), len(b))
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    over = limit + 1
+    previous = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [over] * (len(b) + 1)
+        if i <= limit:
+            current[0] = i
+        low = max(1, i - limit)
+        high = min(len(b), i + limit)
+        best = current[0]
+        for j in range(low, high + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j - 1] + cost, previous[j] + 1, current[j - 1] + 1, over)
+            current[j] = value
+            if value < best:
+                best = value
+        if best > limit:
+            return over
+        previous = current
+    return min(previous[len(b)], over)
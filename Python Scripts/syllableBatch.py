@@ -0,0 +1,142 @@
+# This script generates syllables in bulk
+
+# morphologyGen.generate_syllable_from_structure() builds one syllable at a time out of IpaSound objects, which is
+# fine for a lexicon of a few dozen morphemes but far too slow for name tables of millions of syllables.
+# SyllableEngine encodes the phonology as small integers (consonants first, then vowels) and produces whole batches
+# of syllables as numpy arrays: one array of syllable lengths and one flat array of phoneme codes.
+# The syllables follow the same rules as generate_syllable(): structures from the same StructureTable and the
+# contrasting length rule, which forbids picking a phoneme that would make a run longer than the contrasting length.
+
+import numpy as np
+import seeding
+import languageConstraints
+import morphologyGen
+import phonologyGen
+from morphologyGen import Syllable
+
+
+class SyllableBatch:
+    def __init__(self, phoneme_table, lengths, phonemes):
+        # phoneme_table[code] is the IpaSound a phoneme code stands for
+        self.phoneme_table = phoneme_table
+        self.lengths = lengths
+        self.phonemes = phonemes
+        # syllable i is phonemes[offsets[i]:offsets[i + 1]]
+        self.offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self.offsets[1:])
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def codes(self, i):
+        return self.phonemes[self.offsets[i]:self.offsets[i + 1]]
+
+    def pronunciation(self, i):
+        return ''.join(self.phoneme_table[c].ipaChar for c in self.codes(i))
+
+    def pronunciations(self):
+        chars = [p.ipaChar for p in self.phoneme_table]
+        flat = [chars[c] for c in self.phonemes.tolist()]
+        offsets = self.offsets.tolist()
+        return [''.join(flat[offsets[i]:offsets[i + 1]]) for i in range(len(self))]
+
+    # returns the phoneme codes translated into IPA inventory codes as one bytes object
+    def inventory_phonemes(self):
+        code_by_char = phonologyGen.get_ipa_inventory().code_by_char
+        inventory_codes = np.array([code_by_char[p.ipaChar] for p in self.phoneme_table], dtype=np.uint8)
+        return inventory_codes[self.phonemes].tobytes()
+
+    def to_syllables(self):
+        flat = self.inventory_phonemes()
+        offsets = self.offsets.tolist()
+        return [Syllable(flat[offsets[i]:offsets[i + 1]]) for i in range(len(self))]
+
+
+class SyllableEngine:
+    def __init__(self, phonology, constraints=None):
+        consonants = tuple(phonology[0])
+        vowels = tuple(phonology[1])
+        if len(consonants) + len(vowels) > 256:
+            raise ValueError('phonology has too many phonemes to encode in a byte')
+        constraints = languageConstraints.parse_constraints(constraints)
+
+        # codes 0 .. consonant_count - 1 are consonants, the rest are vowels
+        self.phoneme_table = consonants + vowels
+        self.consonant_count = len(consonants)
+        self.vowel_count = len(vowels)
+        self.structure_table = morphologyGen.get_structure_table(constraints.starting_consonant_cluster_sizes,
+                                                                 constraints.vowel_cluster_sizes,
+                                                                 constraints.ending_consonant_cluster_sizes)
+        self.starting_cluster_sizes = np.array(self.structure_table.starting_cluster_sizes, dtype=np.int64)
+        self.vowel_cluster_sizes = np.array(self.structure_table.vowel_cluster_sizes, dtype=np.int64)
+        self.ending_cluster_sizes = np.array(self.structure_table.ending_cluster_sizes, dtype=np.int64)
+        self.contrasting_consonant_length = constraints.contrasting_consonant_length
+        self.contrasting_vowel_length = constraints.contrasting_vowel_length
+
+    # returns a SyllableBatch of count syllables
+    def generate(self, count, rng=None):
+        rng = seeding.numpy_rng(rng)
+        # one draw per syllable picks its whole structure
+        structures = self.structure_table.sample(count, rng)
+        onsets = self.starting_cluster_sizes[structures]
+        nuclei = self.vowel_cluster_sizes[structures]
+        codas = self.ending_cluster_sizes[structures]
+        lengths = onsets + nuclei + codas
+        max_length = int(lengths.max()) if count > 0 else 0
+
+        # lay the syllables out as rows of a padded grid and fill it one column at a time, so every phoneme can see
+        # the ones before it in its syllable when applying the contrasting length rule
+        columns = np.arange(max_length)
+        is_vowel = (columns >= onsets[:, None]) & (columns < (onsets + nuclei)[:, None])
+        is_used = columns < lengths[:, None]
+        grid = np.zeros((count, max_length), dtype=np.uint8)
+        for j in range(max_length):
+            self.fill_column(grid, j, is_vowel[:, j], is_used[:, j], rng)
+
+        return SyllableBatch(self.phoneme_table, lengths.astype(np.uint8), grid[is_used])
+
+    def fill_column(self, grid, j, is_vowel, is_used, rng):
+        consonant_rows = np.flatnonzero(is_used & ~is_vowel)
+        vowel_rows = np.flatnonzero(is_used & is_vowel)
+
+        # consonants look back at up to contrasting_consonant_length phonemes once two phonemes have been placed
+        if j >= 2:
+            window = min(self.contrasting_consonant_length, j)
+            forbidden = repeated_phoneme(grid, consonant_rows, j, window)
+        else:
+            forbidden = np.full(len(consonant_rows), -1)
+        grid[consonant_rows, j] = pick_phonemes(0, self.consonant_count, forbidden, 'consonant', rng)
+
+        # vowels look back at contrasting_vowel_length phonemes once more than that many have been placed
+        if j > self.contrasting_vowel_length:
+            forbidden = repeated_phoneme(grid, vowel_rows, j, self.contrasting_vowel_length)
+        else:
+            forbidden = np.full(len(vowel_rows), -1)
+        grid[vowel_rows, j] = pick_phonemes(self.consonant_count, self.vowel_count, forbidden, 'vowel', rng)
+
+
+# for each row returns the phoneme that fills all of the previous window columns, or -1 if they differ
+# picking that phoneme again would break the contrasting length rule
+def repeated_phoneme(grid, rows, j, window):
+    previous = grid[rows, j - window:j]
+    repeated = np.all(previous == previous[:, -1:], axis=1)
+    return np.where(repeated, previous[:, -1].astype(np.int64), -1)
+
+
+# picks one phoneme code out of first_code .. first_code + code_count - 1 for every entry of forbidden
+# where forbidden holds a code, the pick is made uniformly among the other codes instead
+def pick_phonemes(first_code, code_count, forbidden, kind, rng):
+    if len(forbidden) == 0:
+        return forbidden
+    if code_count == 0:
+        raise ValueError(f'phonology has no {kind}s to build syllables from')
+
+    local_forbidden = forbidden - first_code
+    is_forbidden = (local_forbidden >= 0) & (local_forbidden < code_count)
+    if code_count == 1 and is_forbidden.any():
+        raise ValueError(f'the contrasting {kind} length rule cannot be met with a single {kind}')
+
+    # forbidden rows draw from one fewer code and skip over the forbidden one
+    picks = np.floor(rng.random(len(forbidden)) * (code_count - is_forbidden)).astype(np.int64)
+    picks += is_forbidden & (picks >= local_forbidden)
+    return picks + first_code
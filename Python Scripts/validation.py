@@ -0,0 +1,377 @@
+# This script checks that the random samplers of the generators follow the distributions they are meant to
+#
+# usage: python validation.py [--samples N] [--seed N] [--only NAME ...] [--alpha P]
+#
+# Every case draws a large sample from one sampler and compares the counts of its values against the exact target
+# distribution, worked out from the same constants the generators use:
+#     zipf.zipfy_random() picks the i-th of n elements with weight n - i
+#     phonologyGen.pick_consonant_inventory_size() picks one of the CONSONANT_INVENTORY_SIZE_CATEGORIES in proportion
+#     to its languages and a uniform size within it, or a size from the exponential tail above them
+#     phonologyGen.select_consonants() picks every common consonant before any other, so an inventory has as many
+#     common consonants as its size allows
+#     a morpheme has zipf.zipfy_random(max syllables) + 1 syllables, each as long as a structure of the
+#     morphologyGen.StructureTable
+# The vectorized samplers draw --samples values, the one-at-a-time samplers a fraction of that.
+# Each case runs a chi-square goodness of fit test and a Kolmogorov-Smirnov test. The values are discrete, so the
+# KS p-value is conservative and the chi-square test is the stricter of the two. A case fails if either p-value is
+# below --alpha, and the script exits with status 1 if any case failed, so a sampler speedup that changes what it
+# draws is caught. The p-values are computed here in plain python, no scipy or matplotlib needed.
+
+import argparse
+import math
+import random
+import sys
+import time
+from collections import Counter
+import language
+import languageConstraints
+import morphologyGen
+import phonologyGen
+import zipf
+
+SEED = 1234
+DEFAULT_SAMPLES = 1000000
+# many cases are tested at once, so a single unlucky sample should not fail the run
+DEFAULT_ALPHA = 0.001
+# neighbouring values are merged until every chi-square bin expects at least this many samples
+MIN_EXPECTED_COUNT = 5
+# probability left in an unbounded tail once a target distribution stops listing values
+TAIL_PROBABILITY = 1e-12
+# sizes of zipfy distributions to check
+ZIPFY_SIZES = (2, 5, 12)
+
+
+# returns the regularized upper incomplete gamma function Q(a, x) = Γ(a, x) / Γ(a)
+# uses the series of P(a, x) below x = a + 1 and Lentz's continued fraction of Q(a, x) above it
+def regularized_gamma_q(a, x, epsilon=1e-15, max_iterations=10000):
+    if x <= 0:
+        return 1.0
+    log_prefix = a * math.log(x) - x - math.lgamma(a)
+    if x < a + 1:
+        term = total = 1 / a
+        for n in range(1, max_iterations):
+            term *= x / (a + n)
+            total += term
+            if abs(term) < abs(total) * epsilon:
+                break
+        return max(0.0, 1 - total * math.exp(log_prefix))
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    h = d
+    for n in range(1, max_iterations):
+        an = -n * (n - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < epsilon:
+            break
+    return math.exp(log_prefix) * h
+
+
+# returns the probability of a chi-square statistic at least this large with dof degrees of freedom
+def chi_square_p_value(statistic, dof):
+    if dof < 1:
+        return 1.0
+    if math.isinf(statistic):
+        return 0.0
+    return regularized_gamma_q(dof / 2, statistic / 2)
+
+
+# returns the asymptotic probability of a Kolmogorov-Smirnov distance at least d between n samples and their
+# distribution, with Stephens' correction for small n
+def kolmogorov_p_value(d, n):
+    if d <= 0:
+        return 1.0
+    root = math.sqrt(n)
+    x = (root + 0.12 + 0.11 / root) * d
+    total = 0
+    for k in range(1, 101):
+        term = (-1) ** (k - 1) * math.exp(-2 * k * k * x * x)
+        total += term
+        if abs(term) < 1e-12:
+            break
+    return min(1.0, max(0.0, 2 * total))
+
+
+# returns (statistic, degrees of freedom, p-value) of a chi-square goodness of fit test of counts, a dict of value
+# to how many times it was drawn, against distribution, a dict of value to its probability
+def chi_square_test(counts, distribution):
+    n = sum(counts.values())
+    if any(value not in distribution for value in counts):
+        return math.inf, len(distribution) - 1, 0.0
+    # merge neighbouring values into bins that expect enough samples, a small leftover joins the last bin
+    bins = []
+    observed = expected = 0
+    for value in sorted(distribution):
+        observed += counts.get(value, 0)
+        expected += distribution[value] * n
+        if expected >= MIN_EXPECTED_COUNT:
+            bins.append([observed, expected])
+            observed = expected = 0
+    if expected > 0:
+        if bins:
+            bins[-1][0] += observed
+            bins[-1][1] += expected
+        else:
+            bins.append([observed, expected])
+    statistic = sum((o - e) ** 2 / e for o, e in bins)
+    dof = len(bins) - 1
+    return statistic, dof, chi_square_p_value(statistic, dof)
+
+
+# returns (distance, p-value) of a Kolmogorov-Smirnov test of counts against distribution, see chi_square_test()
+def ks_test(counts, distribution):
+    n = sum(counts.values())
+    distance = 0
+    observed = expected = 0
+    for value in sorted(set(distribution) | set(counts)):
+        observed += counts.get(value, 0) / n
+        expected += distribution.get(value, 0)
+        distance = max(distance, abs(observed - expected))
+    return distance, kolmogorov_p_value(distance, n)
+
+
+# returns a dict of value to how many times it is in values, values can be a list or a numpy array
+def count_values(values):
+    if hasattr(values, 'dtype'):
+        import numpy as np
+        unique, counts = np.unique(values, return_counts=True)
+        return dict(zip(unique.tolist(), counts.tolist()))
+    return dict(Counter(values))
+
+
+# the index zipf.zipfy_random(n) returns, with probability (n - i) / triangular_number(n)
+def zipfy_distribution(n):
+    total = zipf.triangular_number(n)
+    return {i: (n - i) / total for i in range(n)}
+
+
+# the size phonologyGen.pick_consonant_inventory_size() returns
+def consonant_inventory_size_distribution():
+    distribution = {}
+    for languages, smallest, largest in phonologyGen.CONSONANT_INVENTORY_SIZE_CATEGORIES:
+        for size in range(smallest, largest + 1):
+            distribution[size] = languages / phonologyGen.CONSONANT_INVENTORY_SAMPLE_SIZE / (largest - smallest + 1)
+    large = phonologyGen.CONSONANT_INVENTORY_SAMPLE_SIZE - sum(c[0] for c in
+                                                               phonologyGen.CONSONANT_INVENTORY_SIZE_CATEGORIES)
+    large /= phonologyGen.CONSONANT_INVENTORY_SAMPLE_SIZE
+    # floor(x * range) = k for an exponential x with rate 1 / scale has probability e^(-rate k / range) times
+    # 1 - e^(-rate / range), a geometric distribution
+    ratio = math.exp(-1 / (phonologyGen.LARGE_CONSONANT_INVENTORY_SCALE
+                           * phonologyGen.LARGE_CONSONANT_INVENTORY_RANGE))
+    k = 0
+    remaining = 1.0
+    while remaining > TAIL_PROBABILITY:
+        distribution[phonologyGen.LARGE_CONSONANT_INVENTORY_MINIMUM + k] = large * remaining * (1 - ratio)
+        remaining *= ratio
+        k += 1
+    distribution[phonologyGen.LARGE_CONSONANT_INVENTORY_MINIMUM + k - 1] += large * remaining
+    return distribution
+
+
+# the number of common consonants in an inventory picked by phonologyGen.select_consonants() without constraints
+def common_consonant_count_distribution():
+    common = sum(c.commonness == phonologyGen.CONSONANT_COMMONNESS_TIERS[0]
+                 for c in phonologyGen.get_ipa_inventory().consonants)
+    distribution = {}
+    for size, p in consonant_inventory_size_distribution().items():
+        distribution[min(size, common)] = distribution.get(min(size, common), 0) + p
+    return distribution
+
+
+# the number of phonemes in a syllable made from table
+def syllable_length_distribution(table):
+    distribution = {}
+    for i in range(len(table)):
+        length = len(table.structures[i])
+        distribution[length] = distribution.get(length, 0) + table.probability(i)
+    return distribution
+
+
+# the number of phonemes in a morpheme made by morphologyGen.generate_morpheme_from_meaning()
+def morpheme_length_distribution(constraints):
+    syllable = syllable_length_distribution(structure_table(constraints))
+    distribution = {}
+    # lengths is the distribution of the length of count syllables, built up one syllable at a time
+    lengths = {0: 1.0}
+    for count, p in enumerate(zipfy_distribution(constraints.max_syllables).values(), start=1):
+        convolved = {}
+        for total, q in lengths.items():
+            for length, r in syllable.items():
+                convolved[total + length] = convolved.get(total + length, 0) + q * r
+        lengths = convolved
+        for length, q in lengths.items():
+            distribution[length] = distribution.get(length, 0) + p * q
+    return distribution
+
+
+def structure_table(constraints):
+    return morphologyGen.get_structure_table(constraints.starting_consonant_cluster_sizes,
+                                             constraints.vowel_cluster_sizes,
+                                             constraints.ending_consonant_cluster_sizes)
+
+
+def validation_structure_table():
+    return structure_table(validation_constraints())
+
+
+def validation_constraints():
+    return languageConstraints.parse_constraints(None)
+
+
+def validation_phonology():
+    return language.generate_language(SEED).phonology
+
+
+# One sampler to check
+# distribution() returns the target distribution and sample(size, rng) draws size values from a random.Random
+# fraction is the share of --samples drawn, smaller for the samplers that draw one value at a time
+class ValidationCase:
+    def __init__(self, name, distribution, sample, fraction=1.0):
+        self.name = name
+        self.distribution = distribution
+        self.sample = sample
+        self.fraction = fraction
+
+
+def zipfy_random_case(n):
+    return ValidationCase(f'zipfy_random_{n}', lambda: zipfy_distribution(n),
+                          lambda size, rng: [zipf.zipfy_random(n, rng) for i in range(size)], fraction=0.5)
+
+
+def zipfy_random_batch_case(n):
+    return ValidationCase(f'zipfy_random_batch_{n}', lambda: zipfy_distribution(n),
+                          lambda size, rng: zipf.zipfy_random_batch(n, size, rng))
+
+
+def sample_consonant_inventory_sizes(size, rng):
+    return [phonologyGen.pick_consonant_inventory_size(rng) for i in range(size)]
+
+
+def count_common_consonants(consonants):
+    return sum(c.commonness == phonologyGen.CONSONANT_COMMONNESS_TIERS[0] for c in consonants)
+
+
+def sample_common_consonant_counts(size, rng):
+    return [count_common_consonants(phonologyGen.select_consonants(None, rng)) for i in range(size)]
+
+
+def sample_common_consonant_counts_batch(size, rng):
+    import numpy as np
+    inventories = phonologyGen.select_consonants_batch(size, None, np.random.default_rng(rng.getrandbits(64)))
+    return [count_common_consonants(consonants) for consonants in inventories]
+
+
+def sample_syllable_lengths(size, rng):
+    import syllableBatch
+    return syllableBatch.SyllableEngine(validation_phonology(), validation_constraints()).generate(size, rng).lengths
+
+
+def sample_morpheme_lengths(size, rng):
+    phonology = validation_phonology()
+    constraints = validation_constraints()
+    return [len(morphologyGen.generate_morpheme_from_meaning(phonology, None, 'freeLexical', 'nomeaning',
+                                                             constraints, rng).phonemes) for i in range(size)]
+
+
+# draws the syllable counts of size morphemes at once and the syllables of all of them in one batch
+def sample_morpheme_lengths_batch(size, rng):
+    import numpy as np
+    import syllableBatch
+    constraints = validation_constraints()
+    rng = np.random.default_rng(rng.getrandbits(64))
+    syllable_counts = zipf.zipfy_random_batch(constraints.max_syllables, size, rng) + 1
+    engine = syllableBatch.SyllableEngine(validation_phonology(), constraints)
+    lengths = engine.generate(int(syllable_counts.sum()), rng).lengths.astype(np.int64)
+    starts = np.concatenate(([0], np.cumsum(syllable_counts)[:-1]))
+    return np.add.reduceat(lengths, starts)
+
+
+CASES = [zipfy_random_case(n) for n in ZIPFY_SIZES] + [zipfy_random_batch_case(n) for n in ZIPFY_SIZES] + [
+    ValidationCase('consonant_inventory_size', consonant_inventory_size_distribution,
+                   sample_consonant_inventory_sizes, fraction=0.5),
+    ValidationCase('consonant_inventory_size_batch', consonant_inventory_size_distribution,
+                   lambda size, rng: phonologyGen.sample_consonant_inventory_sizes(size, rng)),
+    ValidationCase('common_consonant_count', common_consonant_count_distribution, sample_common_consonant_counts,
+                   fraction=0.02),
+    ValidationCase('common_consonant_count_batch', common_consonant_count_distribution,
+                   sample_common_consonant_counts_batch, fraction=0.05),
+    ValidationCase('syllable_length_batch', lambda: syllable_length_distribution(validation_structure_table()),
+                   sample_syllable_lengths),
+    ValidationCase('morpheme_length', lambda: morpheme_length_distribution(validation_constraints()),
+                   sample_morpheme_lengths, fraction=0.05),
+    ValidationCase('morpheme_length_batch', lambda: morpheme_length_distribution(validation_constraints()),
+                   sample_morpheme_lengths_batch)
+]
+
+
+# runs case on samples draws and returns its results
+def run_case(case, samples, seed):
+    size = max(1, int(samples * case.fraction))
+    start = time.perf_counter()
+    counts = count_values(case.sample(size, random.Random(seed)))
+    seconds = time.perf_counter() - start
+    distribution = case.distribution()
+    chi_square, dof, chi_square_p = chi_square_test(counts, distribution)
+    distance, ks_p = ks_test(counts, distribution)
+    return {
+        'samples': size,
+        'seconds': seconds,
+        'chi_square': chi_square,
+        'dof': dof,
+        'chi_square_p': chi_square_p,
+        'ks_distance': distance,
+        'ks_p': ks_p
+    }
+
+
+def print_results(results, alpha):
+    print(f'{"case":32} {"samples":>9} {"seconds":>8} {"chi2":>10} {"dof":>4} {"chi2 p":>8} {"KS D":>8} '
+          f'{"KS p":>8} {"result":>6}')
+    for name, r in results.items():
+        result = 'pass' if passed(r, alpha) else 'FAIL'
+        print(f'{name:32} {r["samples"]:9d} {r["seconds"]:8.2f} {r["chi_square"]:10.2f} {r["dof"]:4d} '
+              f'{r["chi_square_p"]:8.4f} {r["ks_distance"]:8.5f} {r["ks_p"]:8.4f} {result:>6}')
+
+
+def passed(result, alpha):
+    return result['chi_square_p'] >= alpha and result['ks_p'] >= alpha
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that the generators' samplers follow their distributions.")
+    parser.add_argument('--samples', type=int, default=DEFAULT_SAMPLES, help='how many values the batch samplers draw')
+    parser.add_argument('--seed', type=int, default=SEED, help='seed of the samples')
+    parser.add_argument('--only', nargs='+', metavar='NAME', help='only run these cases')
+    parser.add_argument('--alpha', type=float, default=DEFAULT_ALPHA,
+                        help='p-value below which a case fails')
+    args = parser.parse_args(argv)
+    if args.only:
+        names = [c.name for c in CASES]
+        unknown = [name for name in args.only if name not in names]
+        if unknown:
+            parser.error(f'unknown case {", ".join(unknown)}, expected one of {", ".join(names)}')
+
+    results = {}
+    for case in CASES:
+        if args.only and case.name not in args.only:
+            continue
+        print(f'running {case.name}...', file=sys.stderr)
+        results[case.name] = run_case(case, args.samples, args.seed)
+
+    print_results(results, args.alpha)
+    failures = [name for name, r in results.items() if not passed(r, args.alpha)]
+    for name in failures:
+        print(f'failed: {name} does not follow its target distribution')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
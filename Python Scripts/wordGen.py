@@ -1,31 +1,200 @@
+import itertools
 import math
-import random
+from collections import OrderedDict
+import phonologyGen
+import seeding
+
+# how many stems a WordComposer keeps the composed phonemes of, the most recently used ones are kept
+DEFAULT_PARADIGM_CACHE_SIZE = 4096
+
+# joins the meanings of the morphemes of a composed word, e.g. 'un-happy-ness'
+MEANING_SEPARATOR = '-'
 
 class Word:
-    def __init__(self, pronunciation, meaning):
-        self.pronunciation = pronunciation
+    __slots__ = ('phonemes', 'meaning', 'morphemes', '_pronunciation')
+
+    # pronunciation can be a list of IpaSounds or the bytes of their inventory codes
+    # morphemes are the (prefix, stem, suffix) morphemes of a composed word, prefix and suffix can be None
+    def __init__(self, pronunciation, meaning, morphemes=None):
+        if isinstance(pronunciation, (bytes, bytearray)):
+            self.phonemes = bytes(pronunciation)
+        else:
+            self.phonemes = phonologyGen.get_ipa_inventory().encode(pronunciation)
         self.meaning = meaning
+        self.morphemes = morphemes
+        self._pronunciation = None
+
+    # builds a word straight from inventory codes, phonemes must already be bytes
+    @classmethod
+    def from_phonemes(cls, phonemes, meaning, morphemes=None):
+        word = cls.__new__(cls)
+        word.phonemes = phonemes
+        word.meaning = meaning
+        word.morphemes = morphemes
+        word._pronunciation = None
+        return word
+
+    # the list of IpaSounds in this word
+    @property
+    def pronunciation(self):
+        return phonologyGen.get_ipa_inventory().decode(self.phonemes)
 
     def __str__(self):
-        output = ""
-        for s in self.pronunciation:
-            output += str(s)
-        return output
+        if self._pronunciation is None:
+            self._pronunciation = phonologyGen.get_ipa_inventory().pronounce(self.phonemes)
+        return self._pronunciation
 
-def generateSyllable(phonology):
+def generateSyllable(phonology, rng=None):
+    rng = seeding.python_rng(rng)
     consonants = phonology[0]
     vowels = phonology[1]
     syl = []
-    syl.append(consonants[math.floor(random.random() * len(consonants))])
-    syl.append(vowels[math.floor(random.random() * len(vowels))])
+    syl.append(consonants[math.floor(rng.random() * len(consonants))])
+    syl.append(vowels[math.floor(rng.random() * len(vowels))])
     return syl
 
-def generateWord(phonology, meaning):
+def generateWord(phonology, meaning, rng=None):
+    rng = seeding.python_rng(rng)
     # between 1 and 4 syllables.
     # TODO: make this match a distribution of some kind.
-    nSyllables = 1 + math.floor(random.random()*4)
+    nSyllables = 1 + math.floor(rng.random()*4)
     pronunciation = []
     for i in range(nSyllables):
-        pronunciation += generateSyllable(phonology)
+        pronunciation += generateSyllable(phonology, rng)
     # debug
     return Word(pronunciation, meaning)
+
+# A trie of bound morphemes keyed by their phoneme codes
+# with reverse the phonemes are stored back to front, so suffixes can be matched from the end of a word
+class AffixTrie:
+    # key of the morphemes ending at a node, never a phoneme code since those are bytes
+    END = -1
+
+    def __init__(self, reverse=False):
+        self.reverse = reverse
+        self.root = {}
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, morpheme):
+        phonemes = morpheme.phonemes[::-1] if self.reverse else morpheme.phonemes
+        node = self.root
+        for code in phonemes:
+            node = node.setdefault(code, {})
+        node.setdefault(AffixTrie.END, []).append(morpheme)
+        self.count += 1
+
+    # yields (length, morpheme) for every stored morpheme phonemes starts with, or ends with if reverse,
+    # shortest first
+    def matches(self, phonemes):
+        if self.reverse:
+            phonemes = phonemes[::-1]
+        node = self.root
+        for length, code in enumerate(phonemes, start=1):
+            node = node.get(code)
+            if node is None:
+                return
+            for morpheme in node.get(AffixTrie.END, ()):
+                yield length, morpheme
+
+# Composes words from stems and the boundPrefix and boundAffix morphemes in affixes
+# Every word has at most one prefix and one suffix, so the paradigm of a stem has a form for every (prefix, suffix)
+# pair in forms, the bare stem first.
+# The composed phonemes of a paradigm are kept per stem phonemes for the cache_size most recently used stems, and
+# every stem that was composed can be found again by segment().
+class WordComposer:
+    def __init__(self, affixes, cache_size=DEFAULT_PARADIGM_CACHE_SIZE):
+        self.prefixes = []
+        self.suffixes = []
+        for m in affixes:
+            if m.morphemeType == 'boundPrefix':
+                self.prefixes.append(m)
+            elif m.morphemeType == 'boundAffix':
+                self.suffixes.append(m)
+            else:
+                raise ValueError(f"'{m.meaning}' is a {m.morphemeType} morpheme, not a boundPrefix or boundAffix")
+        self.prefix_trie = AffixTrie()
+        for m in self.prefixes:
+            self.prefix_trie.add(m)
+        self.suffix_trie = AffixTrie(reverse=True)
+        for m in self.suffixes:
+            self.suffix_trie.add(m)
+        self.forms = list(itertools.product([None] + self.prefixes, [None] + self.suffixes))
+        # the empty buffers stand for a missing prefix or suffix
+        self.prefix_phonemes = [b''] + [m.phonemes for m in self.prefixes]
+        self.suffix_phonemes = [b''] + [m.phonemes for m in self.suffixes]
+        # what every form adds around the meaning of the stem
+        self.form_meanings = [(prefix_meaning(prefix), suffix_meaning(suffix)) for prefix, suffix in self.forms]
+        self.cache_size = cache_size
+        # stem phonemes -> composed phonemes of every form, oldest first
+        self.paradigm_cache = OrderedDict()
+        # stem phonemes -> the stems with those phonemes
+        self.stems = {}
+
+    # makes stem findable by segment()
+    def add_stem(self, stem):
+        stems = self.stems.setdefault(stem.phonemes, [])
+        if not any(s is stem for s in stems):
+            stems.append(stem)
+
+    # returns the composed phonemes of every form of stem, in the order of forms
+    def paradigm_phonemes(self, stem):
+        phonemes = stem.phonemes
+        cache = self.paradigm_cache
+        output = cache.get(phonemes)
+        if output is not None:
+            cache.move_to_end(phonemes)
+            return output
+        self.add_stem(stem)
+        prefixed = [p + phonemes for p in self.prefix_phonemes]
+        output = [p + s for p in prefixed for s in self.suffix_phonemes]
+        cache[phonemes] = output
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+        return output
+
+    # returns a Word for every form of stem, in the order of forms
+    def paradigm(self, stem):
+        meaning = stem.meaning
+        return [Word.from_phonemes(phonemes, before + meaning + after, (prefix, stem, suffix))
+                for phonemes, (prefix, suffix), (before, after)
+                in zip(self.paradigm_phonemes(stem), self.forms, self.form_meanings)]
+
+    # yields (stem, paradigm) for every stem in stems, which can be a generator
+    def paradigms(self, stems):
+        for stem in stems:
+            yield stem, self.paradigm(stem)
+
+    def compose(self, stem, prefix=None, suffix=None):
+        self.add_stem(stem)
+        phonemes = stem.phonemes
+        if prefix is not None:
+            phonemes = prefix.phonemes + phonemes
+        if suffix is not None:
+            phonemes = phonemes + suffix.phonemes
+        return Word.from_phonemes(phonemes, prefix_meaning(prefix) + stem.meaning + suffix_meaning(suffix),
+                                  (prefix, stem, suffix))
+
+    # returns every (prefix, stem, suffix) the phonemes of a word can be split into, where prefix and suffix are
+    # affixes of this composer or None and stem is a stem composed before, empty if there is none
+    def segment(self, phonemes):
+        phonemes = bytes(phonemes)
+        prefixes = [(0, None)] + list(self.prefix_trie.matches(phonemes))
+        suffixes = [(0, None)] + list(self.suffix_trie.matches(phonemes))
+        output = []
+        for prefix_length, prefix in prefixes:
+            for suffix_length, suffix in suffixes:
+                end = len(phonemes) - suffix_length
+                if end <= prefix_length:
+                    break
+                for stem in self.stems.get(phonemes[prefix_length:end], ()):
+                    output.append((prefix, stem, suffix))
+        return output
+
+def prefix_meaning(prefix):
+    return '' if prefix is None else prefix.meaning + MEANING_SEPARATOR
+
+def suffix_meaning(suffix):
+    return '' if suffix is None else MEANING_SEPARATOR + suffix.meaning
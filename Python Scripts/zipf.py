@@ -1,5 +1,7 @@
 import math
-import random
+import seeding
+from bisect import bisect_left
+from functools import lru_cache
 
 EULER = 0.5772156649
 
@@ -8,13 +10,29 @@ EULER = 0.5772156649
 # n is always an integer between 0 and n-1 inclusively
 # read more about zipf's law here:
 # https://en.wikipedia.org/wiki/Zipf%27s_law
-def zipfy_random(num_of_elements):
-    rand = random.random() * triangular_number(num_of_elements)
-    output = 0
-    while triangular_number(output) < rand:
-        output += 1
-    output = num_of_elements - output
-    return output
+def zipfy_random(num_of_elements, rng=None):
+    table = zipfy_table(num_of_elements)
+    rand = seeding.python_rng(rng).random() * table[-1]
+    # bisect finds the same index the linear scan over triangular numbers used to walk up to
+    return num_of_elements - bisect_left(table, rand)
+
+
+# returns size zipfy indices out of num_of_elements at once as a numpy array
+# equivalent to calling zipfy_random size times, but without paying python-loop cost per draw
+def zipfy_random_batch(num_of_elements, size, rng=None):
+    import numpy as np
+    table = np.asarray(zipfy_table(num_of_elements))
+    rand = seeding.numpy_rng(rng).random(size) * table[-1]
+    return num_of_elements - np.searchsorted(table, rand, side='left')
+
+
+# cumulative table of triangular numbers 0, 1, 3, 6, ... up to triangular_number(num_of_elements)
+# cached per num_of_elements since the same few sizes are sampled over and over
+@lru_cache(maxsize=None)
+def zipfy_table(num_of_elements):
+    if num_of_elements < 1:
+        raise ValueError(f'zipfy distribution needs at least one element, got {num_of_elements}')
+    return tuple(triangular_number(n) for n in range(num_of_elements + 1))
 
 
 # defined as 1 + 2 + 3 + ... + n